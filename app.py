@@ -1,22 +1,38 @@
 # app.py
-import math
+import atexit
+import json
 import os
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import mysql.connector
 import numpy as np
-import pandas as pd
-from joblib import load
-import bcrypt
 import jwt
 import datetime
 from flask import send_file
 
+from db import ConnectionPool, PoolTimeout, fetch_all, fetch_one
+from donor_index import BloodGroupIndex
+from hashing import HasherBusy, PasswordHasher
+from donor_store import DonorSnapshot, DonorView, fetch_batch_candidates, fetch_match_candidates
+from gazetteer import UNKNOWN_LOCATION
+from match_jobs import MatchJobQueue
+from match_writer import MatchWriter, has_match_key, match_rows, save_match_rows
+from model_registry import ModelRegistry
+from notifier import Notifier, SMTPPool, match_messages
+from send_email import SENDER_APP_PASSWORD, SENDER_EMAIL, SMTP_HOST, SMTP_PORT, SMTP_STARTTLS
+from ttl_cache import TTLCache
+from matching import (
+    urgency_score, resolve_location,
+    DonorFeatures, score_candidates, rank_donors,
+)
+
 # Optional: import chatbot helper (create chatbot_helper.py as discussed)
 try:
-    from chatbot_helper import get_bot_reply
+    from chatbot_helper import get_bot_reply, stream_bot_reply, chatbot_stats, llm_worker
     CHATBOT_AVAILABLE = True
-except Exception:
+    atexit.register(llm_worker.stop)  # don't leave the model process behind
+except Exception as e:
+    print(f"⚠️ Chatbot disabled: {e}")
     CHATBOT_AVAILABLE = False
 
 # -----------------------
@@ -32,85 +48,116 @@ DB_CONFIG = {
     "auth_plugin": os.environ.get('DB_AUTH_PLUGIN', 'mysql_native_password')
 }
 
+# Connection pool (see db.py). Overflow connections are closed again when returned;
+# keep DB_POOL_RECYCLE below the server's wait_timeout.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+# Password hashing pool (see hashing.py). BCRYPT_ROUNDS only applies to new hashes.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 2))
+HASH_QUEUE = int(os.environ.get('HASH_QUEUE', 32))
+HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', 10))
+
 # JWT secret (override with env var in production)
 SECRET_KEY = os.environ.get('SECRET_KEY', 'change_this_secret')
 
 TREE_FILE = os.path.join("models", "tree_matcher.joblib")
 LOGREG_FILE = os.path.join("models", "logreg_matcher.joblib")
-
-# -----------------------
-# City coordinates (for distance calculation)
-# keep adding cities/states you need
-# -----------------------
-CITY_COORDS = {
-    # Andhra Pradesh
-    "Visakhapatnam": (17.6868, 83.2185),
-    "Vijayawada": (16.5062, 80.6480),
-    "Guntur": (16.3067, 80.4365),
-    "Nellore": (14.4426, 79.9865),
-    "Kurnool": (15.8281, 78.0373),
-    "Tirupati": (13.6288, 79.4192),
-    "Rajahmundry": (16.9891, 81.7898),
-    "Kadapa": (14.4674, 78.8242),
-    "Anantapur": (14.6816, 77.6000),
-    "Ongole": (15.5057, 80.0499),
-    # Telangana
-    "Hyderabad": (17.3850, 78.4867),
-    "Warangal": (17.9689, 79.5941),
-    "Nizamabad": (18.6727, 78.0941),
-    "Khammam": (17.2473, 80.1514),
-    "Karimnagar": (18.4386, 79.1281),
-    "Mahbubnagar": (16.7428, 77.9874),
-    "Adilabad": (19.6640, 78.5316),
-    "Nalgonda": (17.0540, 79.2670),
-    "Suryapet": (17.1450, 79.6126),
-    "Ramagundam": (18.8060, 79.4526),
-}
+COMPILED_MODEL_FILE = os.path.join("models", "matcher_compiled.npz")  # from compile_models.py
+# Seconds between checks for retrained/recompiled models (0 = load once at startup)
+MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', 10))
+
+# Donor snapshot: matching reads donors from memory and refreshes with small delta queries.
+# Set DONOR_SNAPSHOT=0 to push matching filters down to MySQL on every match instead.
+DONOR_SNAPSHOT_ENABLED = os.environ.get('DONOR_SNAPSHOT', '1') == '1'
+DONOR_SNAPSHOT_MAX_STALENESS = float(os.environ.get('DONOR_SNAPSHOT_MAX_STALENESS', 30))
+DONOR_SNAPSHOT_FULL_RELOAD = float(os.environ.get('DONOR_SNAPSHOT_FULL_RELOAD', 3600))
+
+# Number of donors returned by /match (overridable per call with ?k=)
+DEFAULT_MATCH_K = int(os.environ.get('DEFAULT_MATCH_K', 10))
+MAX_MATCH_K = int(os.environ.get('MAX_MATCH_K', 100))
+MAX_BATCH_REQUESTS = int(os.environ.get('MAX_BATCH_REQUESTS', 200))
+
+# /matches/request/<id>: largest ?limit= page, and rows fetched per round trip when streaming NDJSON
+MAX_MATCHES_PAGE = int(os.environ.get('MAX_MATCHES_PAGE', 1000))
+MATCH_STREAM_CHUNK = int(os.environ.get('MATCH_STREAM_CHUNK', 500))
+
+# Set MATCH_PERSIST_ASYNC=1 to save match results from a background writer
+# instead of before the /match response is sent.
+MATCH_PERSIST_ASYNC = os.environ.get('MATCH_PERSIST_ASYNC', '0') == '1'
+MATCH_WRITER_QUEUE = int(os.environ.get('MATCH_WRITER_QUEUE', 1000))
+
+# Background matching on /api/request/create (MATCH_ON_CREATE=0 to disable)
+MATCH_ON_CREATE = os.environ.get('MATCH_ON_CREATE', '1') == '1'
+MATCH_JOB_WORKERS = int(os.environ.get('MATCH_JOB_WORKERS', 2))
+MATCH_JOB_QUEUE = int(os.environ.get('MATCH_JOB_QUEUE', 100))
+
+# Match result cache (MATCH_CACHE_SIZE=0 to disable)
+MATCH_CACHE_SIZE = int(os.environ.get('MATCH_CACHE_SIZE', 1024))
+MATCH_CACHE_TTL = float(os.environ.get('MATCH_CACHE_TTL', 60))
+
+# Donor emails from /match/<id>/notify (see notifier.py; server and sender are set in send_email.py).
+# SMTP_POOL_SIZE sessions stay logged in, and that many emails are sent at once.
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 10))
+SMTP_MAX_IDLE = float(os.environ.get('SMTP_MAX_IDLE', 60))  # idle seconds before a session is checked with NOOP
 
 # -----------------------
 # Utils
 # -----------------------
-def haversine_km(lat1, lon1, lat2, lon2):
-    """Return distance in km between two lat/lon points (haversine)."""
-    R = 6371.0
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * (math.sin(dlambda / 2) ** 2)
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-def blood_compatible(donor_bg, req_bg):
-    compat = {
-        'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
-        'O+': ['O+', 'A+', 'B+', 'AB+'],
-        'A-': ['A-', 'A+', 'AB-', 'AB+'],
-        'A+': ['A+', 'AB+'],
-        'B-': ['B-', 'B+', 'AB-', 'AB+'],
-        'B+': ['B+', 'AB+'],
-        'AB-': ['AB-', 'AB+'],
-        'AB+': ['AB+']
-    }
-    return 1 if req_bg in compat.get(donor_bg, []) else 0
+def _open_connection():
+    return mysql.connector.connect(**DB_CONFIG)
 
-def urgency_score(urg):
-    return {'Low': 1, 'Medium': 2, 'High': 3, 'Critical': 4}.get(urg, 2)
+db_pool = ConnectionPool(
+    _open_connection,
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    pre_ping=DB_POOL_PRE_PING,
+)
 
 def safe_connect():
-    """Create and return a new DB connection. Caller must close()."""
-    return mysql.connector.connect(**DB_CONFIG)
+    """Check out a pooled DB connection. Caller must close() (returns it to the pool)."""
+    return db_pool.connect()
+
+password_hasher = PasswordHasher(workers=HASH_WORKERS, max_queue=HASH_QUEUE,
+                                 rounds=BCRYPT_ROUNDS, timeout=HASH_TIMEOUT)
 
 # -----------------------
-# Load models (if present)
+# Match models (hot-reloaded, see model_registry.py)
 # -----------------------
-tree, logreg = None, None
-try:
-    if os.path.exists(TREE_FILE):
-        tree = load(TREE_FILE)
-    if os.path.exists(LOGREG_FILE):
-        logreg = load(LOGREG_FILE)
-except Exception as e:
-    print(f"⚠️ Error loading models: {e}")
-    tree, logreg = None, None
+model_registry = ModelRegistry(COMPILED_MODEL_FILE, TREE_FILE, LOGREG_FILE, poll_interval=MODEL_POLL_INTERVAL)
+model_registry.reload()
+model_registry.start()
+
+# -----------------------
+# Donor snapshot (loaded on first match, or at startup in __main__)
+# -----------------------
+donor_snapshot = DonorSnapshot(
+    safe_connect,
+    max_staleness=DONOR_SNAPSHOT_MAX_STALENESS,
+    full_reload_every=DONOR_SNAPSHOT_FULL_RELOAD,
+)
+
+match_writer = MatchWriter(safe_connect, max_queue=MATCH_WRITER_QUEUE)
+atexit.register(match_writer.flush, 5.0)  # don't drop queued matches on shutdown
+
+# Ranked /match results keyed by (request_id, radius, k, donor version, model version)
+match_cache = TTLCache(maxsize=MATCH_CACHE_SIZE, ttl=MATCH_CACHE_TTL)
+_match_cache_donor_version = None
+model_registry.on_swap(lambda version: match_cache.clear())  # old-version entries can never hit again
+
+notifier = Notifier(
+    SMTPPool(SMTP_HOST, SMTP_PORT, SENDER_EMAIL, SENDER_APP_PASSWORD, size=SMTP_POOL_SIZE,
+             starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT, max_idle=SMTP_MAX_IDLE),
+    sender=SENDER_EMAIL,
+)
+atexit.register(notifier.close)  # log out of the SMTP sessions
 
 # -----------------------
 # Flask app
@@ -122,11 +169,58 @@ CORS(app)  # allow cross origin for mobile app testing
 def home():
     return jsonify({"msg": "Rakth Sathi API is running", "chatbot_available": CHATBOT_AVAILABLE})
 
+@app.route("/metrics")
+def metrics():
+    return jsonify({
+        "db_pool": db_pool.stats(),
+        "password_hasher": password_hasher.stats(),
+        "donor_snapshot": donor_snapshot.stats(),
+        "match_cache": match_cache.stats(),
+        "match_writer": match_writer.stats(),
+        "match_jobs": match_jobs.stats(),
+        "models": model_registry.stats(),
+        "notifier": notifier.stats(),
+        "chatbot": chatbot_stats() if CHATBOT_AVAILABLE else None,
+    })
+
 # -----------------------
-# Chatbot endpointpython 
+# Chatbot endpoint
 # -----------------------
+def _sse(event, data):
+    """One Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _chat_session_id(authorization, data):
+    """Conversation memory key: the logged-in user, else the client's session_id, else None (no memory)."""
+    if authorization and authorization.startswith('Bearer '):
+        try:
+            payload = jwt.decode(authorization[len('Bearer '):], SECRET_KEY, algorithms=['HS256'])
+            return f"user:{int(payload['user_id'])}"
+        except Exception:
+            pass  # expired or invalid token: treat as anonymous
+    session_id = data.get('session_id')
+    return f"session:{session_id}" if session_id else None
+
+def _chat_events(user_msg, session_id=None):
+    """SSE stream of a chatbot reply: a `token` event per piece, then `done` with the whole reply."""
+    pieces = []
+    for piece in stream_bot_reply(user_msg, session_id):
+        pieces.append(piece)
+        yield _sse("token", {"token": piece})
+    yield _sse("done", {"reply": "".join(pieces).strip()})
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # no proxy buffering
+
 @app.route("/chatbot", methods=["POST"])
 def chatbot_route():
+    """
+    JSON body: {"message": "...", "session_id": optional}; returns {"reply": "..."}.
+    Follow-up context is kept per logged-in user (Authorization: Bearer), or
+    per session_id for anonymous clients.
+    With ?format=sse (or Accept: text/event-stream) the reply is streamed as
+    Server-Sent Events while GPT4All generates it; rule and FAQ answers come
+    as a single token event.
+    """
     if not CHATBOT_AVAILABLE:
         return jsonify({"error": "Chatbot helper is not available on server."}), 500
 
@@ -135,19 +229,31 @@ def chatbot_route():
         return jsonify({"error": "Please provide a JSON body with 'message' field."}), 400
 
     user_msg = data["message"]
+    session_id = _chat_session_id(request.headers.get('Authorization'), data)
+    if request.args.get("format") == "sse" or request.accept_mimetypes.best == "text/event-stream":
+        return Response(_chat_events(user_msg, session_id), mimetype="text/event-stream", headers=SSE_HEADERS)
     try:
-        reply = get_bot_reply(user_msg)
+        reply = get_bot_reply(user_msg, session_id)
         return jsonify({"reply": reply})
     except Exception as e:
         return jsonify({"error": f"Chatbot error: {str(e)}"}), 500
 
-
 # -----------------------
 # API endpoints used by the frontend
 # -----------------------
-@app.route("/api/donor/register", methods=["POST"])
-def api_register_donor():
-    data = request.get_json(force=True, silent=True) or {}
+INSERT_DONOR_SQL = """
+    INSERT INTO donors (name, email, phone, blood_group, city, state, last_donation_date, pints_donated, availability, is_active)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+INSERT_USER_SQL = "INSERT INTO users (email, password_hash, name) VALUES (%s, %s, %s)"
+LOGIN_SQL = "SELECT user_id, password_hash, name FROM users WHERE email = %s"
+INSERT_REQUEST_SQL = """
+    INSERT INTO requests (patient_name, email, phone, blood_group_needed, city, urgency, radius_km)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _donor_values(data):
+    """INSERT_DONOR_SQL parameters from a /api/donor/register body."""
     # Basic validation
     name = data.get('name') or data.get('full_name') or ''
     email = data.get('email') or ''
@@ -159,21 +265,61 @@ def api_register_donor():
     pints_donated = int(data.get('pints_donated') or 0)
     is_active = int(data.get('is_active') or 0)
     availability = data.get('availability') or ''
+    return (name, email, phone, blood_group, city, state, last_donation_date, pints_donated, availability, is_active)
+
+def _login_payload(row):
+    """JSON body for a successful login, given the users row from LOGIN_SQL."""
+    payload = {
+        'user_id': int(row['user_id']),
+        'name': row.get('name', ''),
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=6)
+    }
+    token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    return {'token': token, 'user_id': int(row['user_id']), 'name': row.get('name', '')}
+
+def _request_values(data):
+    """INSERT_REQUEST_SQL parameters from a /api/request/create body."""
+    patient_name = data.get('patient_name') or ''
+    email = data.get('email') or ''
+    phone = data.get('phone') or ''
+    blood_group = data.get('blood_group') or data.get('blood_group_needed') or ''
+    city = data.get('city') or ''
+    urgency = data.get('urgency') or ''
+    radius_km = float(data.get('radius_km') or data.get('radius') or 20)
+    return (patient_name, email, phone, blood_group, city, urgency, radius_km)
+
+def _request_created(request_id, urgency, radius_km):
+    """
+    Start matching in the background (most urgent requests first); the client
+    polls /match/jobs/<job_id> instead of making a blocking /match call.
+    Returns the /api/request/create response body.
+    """
+    job_id = None
+    if MATCH_ON_CREATE and request_id is not None:
+        job_id = match_jobs.submit(request_id, priority=urgency_score(urgency),
+                                   radius=radius_km, k=DEFAULT_MATCH_K)
+    if job_id is None:
+        return {"request_id": request_id, "message": "Request created. Run match endpoint to fetch matches."}
+    return {
+        "request_id": request_id,
+        "job_id": job_id,
+        "status_url": f"/match/jobs/{job_id}",
+        "message": "Request created. Matching started in the background."
+    }
+
+@app.route("/api/donor/register", methods=["POST"])
+def api_register_donor():
+    data = request.get_json(force=True, silent=True) or {}
 
     try:
-        conn = safe_connect()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO donors (name, email, phone, blood_group, city, state, last_donation_date, pints_donated, availability, is_active)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (name, email, phone, blood_group, city, state, last_donation_date, pints_donated, availability, is_active)
-        )
-        conn.commit()
-        donor_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
-        cursor.close()
-        conn.close()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_DONOR_SQL, _donor_values(data))
+            conn.commit()
+            donor_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
+            cursor.close()
+        # pick up the new donor on the next match without waiting for staleness
+        donor_snapshot.mark_stale()
         return jsonify({"donor_id": donor_id})
     except Exception as e:
         return jsonify({"error": f"Could not register donor: {str(e)}"}), 500
@@ -190,21 +336,19 @@ def api_auth_register():
         return jsonify({'error': 'Email and password are required.'}), 400
 
     try:
-        # Hash password
-        pw_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-        conn = safe_connect()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (email, password_hash, name) VALUES (%s, %s, %s)",
-            (email, pw_hash, name)
-        )
-        conn.commit()
-        user_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
-        cursor.close()
-        conn.close()
+        # Hash password (on the hashing pool, see hashing.py)
+        pw_hash = password_hasher.hash(password)
+
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_USER_SQL, (email, pw_hash, name))
+            conn.commit()
+            user_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
+            cursor.close()
         return jsonify({'user_id': user_id})
 
+    except HasherBusy as e:
+        return jsonify({'error': f'Server busy, please retry: {str(e)}'}), 503, {'Retry-After': '1'}
     except Exception as e:
         # Duplicate email handling (MySQL IntegrityError will surface here)
         return jsonify({'error': f'Could not create user: {str(e)}'}), 500
@@ -219,24 +363,18 @@ def api_auth_login():
         return jsonify({'error': 'Email and password required.'}), 400
 
     try:
-        conn = safe_connect()
-        df = pd.read_sql('SELECT user_id, password_hash, name FROM users WHERE email = %s', conn, params=(email,))
-        conn.close()
-        if df.empty:
+        with db_pool.connection() as conn:
+            row = fetch_one(conn, LOGIN_SQL, (email,))
+        if row is None:
             return jsonify({'error': 'Invalid credentials.'}), 401
-        row = df.iloc[0]
         stored_hash = row['password_hash']
-        if not bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
+        if not password_hasher.check(password, stored_hash):
             return jsonify({'error': 'Invalid credentials.'}), 401
 
-        payload = {
-            'user_id': int(row['user_id']),
-            'name': row.get('name', ''),
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=6)
-        }
-        token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
-        return jsonify({'token': token, 'user_id': int(row['user_id']), 'name': row.get('name', '')})
+        return jsonify(_login_payload(row))
 
+    except HasherBusy as e:
+        return jsonify({'error': f'Server busy, please retry: {str(e)}'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': f'Login error: {str(e)}'}), 500
 
@@ -254,36 +392,176 @@ def serve_ui():
 @app.route("/api/request/create", methods=["POST"])
 def api_create_request():
     data = request.get_json(force=True, silent=True) or {}
-    patient_name = data.get('patient_name') or ''
-    email = data.get('email') or ''
-    phone = data.get('phone') or ''
-    blood_group = data.get('blood_group') or data.get('blood_group_needed') or ''
-    city = data.get('city') or ''
-    urgency = data.get('urgency') or ''
-    radius_km = float(data.get('radius_km') or data.get('radius') or 20)
+    values = _request_values(data)
 
     try:
-        conn = safe_connect()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO requests (patient_name, email, phone, blood_group_needed, city, urgency, radius_km)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (patient_name, email, phone, blood_group, city, urgency, radius_km)
-        )
-        conn.commit()
-        request_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
-        cursor.close()
-        conn.close()
-
-        # After creating request, run matching logic using existing match_request function
-        # match_request expects an int path param; call it directly to compute matches
-        # But to keep response consistent, return the new request id and a minimal message
-        return jsonify({"request_id": request_id, "message": "Request created. Run match endpoint to fetch matches."})
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_REQUEST_SQL, values)
+            conn.commit()
+            request_id = cursor.lastrowid if hasattr(cursor, 'lastrowid') else None
+            cursor.close()
+        urgency, radius_km = values[5], values[6]
+        return jsonify(_request_created(request_id, urgency, radius_km))
     except Exception as e:
         return jsonify({"error": f"Could not create request: {str(e)}"}), 500
 
+# -----------------------
+# Match helpers (shared by /match/<id> and /match/batch)
+# -----------------------
+REQUEST_MATCH_COLUMNS = "request_id, blood_group_needed, urgency, city, state"
+
+def _request_context(rq):
+    """Pull the fields matching needs out of a requests row (a dict from fetch_one/fetch_all)."""
+    req_city = rq.get('city', None)
+    req_state = rq.get('state', None)
+    urg = rq.get('urgency', None)
+    return {
+        "request_id": int(rq['request_id']),
+        "blood_group_needed": rq['blood_group_needed'],
+        "city": req_city,
+        "urgency": urg,
+        "location_id": resolve_location(req_city, req_state),
+        "urg_score": urgency_score(urg),
+    }
+
+def _find_candidates(conn, view, ctx, radius, k):
+    """
+    Compatible donors within `radius` of the request. If there are none, widen the
+    search ring until there are enough candidates to fill the list.
+
+    Returns (view, rows, dists, radius_used); in pushdown mode the fallback
+    re-queries MySQL, so the returned view may differ from the one passed in.
+    """
+    req_bg, location = ctx["blood_group_needed"], ctx["location_id"]
+    donor_index = view.index(BloodGroupIndex.from_donors)
+    rows, dists = donor_index.within(req_bg, location, radius)
+    if len(rows):
+        return view, rows, dists, radius
+
+    if not DONOR_SNAPSHOT_ENABLED:
+        view = DonorView(fetch_match_candidates(conn, req_bg, location))
+        donor_index = view.index(BloodGroupIndex.from_donors)
+    rows, dists, radius_used = donor_index.expanding(req_bg, location, radius, min_results=k)
+    return view, rows, dists, radius_used
+
+def _rank_request(conn, view, ctx, radius, k, scorer):
+    """
+    Candidates, features, scores and ranking for one request (see matching.py).
+    Returns (view, final_list, radius_used); final_list is None when no compatible
+    donor was found. conn is only used by the pushdown fallback and may be None
+    when the view is a snapshot.
+    """
+    view, rows, dists, radius_used = _find_candidates(conn, view, ctx, radius, k)
+    if len(rows) == 0:
+        return view, None, radius_used
+    X, blood_match = view.index(DonorFeatures).matrix(rows, ctx["blood_group_needed"], dists, ctx["urg_score"])
+    scores = score_candidates(X, scorer)
+    return view, rank_donors(view.donors, rows, scores, blood_match, dists, limit=k), radius_used
+
+def _save_matches(conn, results, persist_async=None):
+    """
+    Persist (request_id, final_list) pairs with one bulk upsert, or hand them to
+    the background writer when persist_async (default MATCH_PERSIST_ASYNC) is on.
+    """
+    if persist_async is None:
+        persist_async = MATCH_PERSIST_ASYNC
+    rows = [row for request_id, final_list in results for row in match_rows(request_id, final_list)]
+    if not rows:
+        return
+    if persist_async and match_writer.submit(rows):
+        return
+    try:
+        save_match_rows(conn, rows)
+    except Exception as e:
+        # do not fail the whole request if saving matches fails; log and continue
+        print(f"⚠️ Could not save matches to DB: {e}")
+
+def _match_response(ctx, radius_used, donor_version, model_version, final_list):
+    # an unresolved request location has no real distances: the search widened to
+    # everyone, and radius/distances would only show the UNKNOWN_DISTANCE_KM sentinel
+    location_resolved = ctx["location_id"] != UNKNOWN_LOCATION
+    return {
+        "request_id": ctx["request_id"],
+        "blood_group_needed": ctx["blood_group_needed"],
+        "city": ctx["city"],
+        "urgency": ctx["urgency"],
+        "location_resolved": location_resolved,
+        "radius_used_km": radius_used if location_resolved else None,
+        "donor_snapshot_version": donor_version,
+        "model_version": model_version,
+        "top_donors": final_list
+    }
+
+def _match_cache_key(request_id, radius, k, donor_version, model_version):
+    return (int(request_id), float(radius), int(k), donor_version, model_version)
+
+def _sync_match_cache(donor_version):
+    """Drop every cached match as soon as the donor snapshot moves to a new version."""
+    global _match_cache_donor_version
+    if donor_version != _match_cache_donor_version:
+        match_cache.clear()
+        _match_cache_donor_version = donor_version
+
+def _snapshot_view():
+    """
+    The donor snapshot (refreshed first if stale), or None when matching pushes
+    down to SQL. Call it before checking out the request's connection: a refresh
+    checks out a connection of its own, and nesting the two can drain the pool.
+    """
+    return donor_snapshot.get() if DONOR_SNAPSHOT_ENABLED else None
+
+def _run_match(conn, view, request_id, radius, k, persist_async=None):
+    """
+    Match one request and persist the result. Returns (body, http_status).
+    `view` comes from _snapshot_view(). Used by /match/<id> and by background match jobs.
+    """
+    # One scorer for the whole match, even if a new model version is swapped in meanwhile
+    scorer, model_version = model_registry.current()
+
+    # Repeat calls against the same donor/model versions are served from the cache
+    cache_key = None
+    if view is not None:
+        _sync_match_cache(view.version)
+        cache_key = _match_cache_key(request_id, radius, k, view.version, model_version)
+        cached = match_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
+
+    # Parameterized fetch for the request
+    rq = fetch_one(conn, f"SELECT {REQUEST_MATCH_COLUMNS} FROM requests WHERE request_id = %s", (request_id,))
+    if rq is None:
+        return {"error": f"No request found with id {request_id}"}, 404
+
+    ctx = _request_context(rq)
+    req_bg = ctx["blood_group_needed"]
+
+    if view is not None:
+        if view.donors.empty:
+            return {"error": "No donors found"}, 404
+    else:
+        # SQL pushdown: only compatible donors around the request, only needed columns
+        view = DonorView(fetch_match_candidates(conn, req_bg, ctx["location_id"], radius))
+
+    view, final_list, radius_used = _rank_request(conn, view, ctx, radius, k, scorer)
+    if final_list is None:
+        return {"error": f"No donors compatible with {req_bg} found"}, 404
+
+    _save_matches(conn, [(request_id, final_list)], persist_async)
+
+    body = _match_response(ctx, radius_used, view.version, model_version, final_list)
+    if cache_key is not None:
+        match_cache.set(cache_key, body)
+    return body, 200
+
+def _match_job(request_id, radius=50.0, k=DEFAULT_MATCH_K):
+    """Background job body: match with its own connection and persist before finishing."""
+    view = _snapshot_view()
+    with db_pool.connection() as conn:
+        return _run_match(conn, view, request_id, radius, k, persist_async=False)
+
+match_jobs = MatchJobQueue(_match_job, workers=MATCH_JOB_WORKERS, max_queue=MATCH_JOB_QUEUE)
+
 # -----------------------
 # Match endpoint
 # -----------------------
@@ -293,168 +571,350 @@ def match_request(request_id):
     Returns top donors for a given request.
     Query params:
       - radius (km): optional, default 50
+      - k: optional, number of donors to return (default 10, max MAX_MATCH_K)
     """
     radius = float(request.args.get("radius", 50.0))
+    k = min(max(request.args.get("k", DEFAULT_MATCH_K, type=int), 1), MAX_MATCH_K)
 
-    # Connect to DB
-    conn = None
     try:
-        conn = safe_connect()
+        view = _snapshot_view()
+        with db_pool.connection() as conn:
+            body, status = _run_match(conn, view, request_id, radius, k)
+        return jsonify(body), status
+    except PoolTimeout as e:
+        return jsonify({"error": f"DB connection failed: {str(e)}"}), 503
     except Exception as e:
-        return jsonify({"error": f"DB connection failed: {str(e)}"}), 500
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+def _donor_contacts(conn, donor_ids):
+    """{donor_id: {"name", "email"}} for the given donors."""
+    if not donor_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(donor_ids))
+    rows = fetch_all(conn, f"SELECT donor_id, name, email FROM donors WHERE donor_id IN ({placeholders})",
+                     tuple(donor_ids))
+    return {int(row["donor_id"]): row for row in rows}
+
+def _notified_donors(conn, request_id, donor_ids):
+    """The donors among donor_ids already emailed about request_id."""
+    if not donor_ids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(donor_ids))
+    rows = fetch_all(conn, f"SELECT donor_id FROM notifications WHERE request_id = %s AND donor_id IN ({placeholders})",
+                     (request_id, *donor_ids))
+    return {int(row["donor_id"]) for row in rows}
+
+def _record_notified(conn, request_id, donor_ids):
+    """Remember that donor_ids were emailed about request_id."""
+    if not donor_ids:
+        return
+    values = ", ".join(["(%s, %s)"] * len(donor_ids))
+    params = [v for donor_id in donor_ids for v in (request_id, donor_id)]
+    cursor = conn.cursor()
     try:
-        # Parameterized fetch for the request
-        rq = pd.read_sql("SELECT * FROM requests WHERE request_id = %s", conn, params=(request_id,))
-        if rq.empty:
-            return jsonify({"error": f"No request found with id {request_id}"}), 404
-
-        rq = rq.iloc[0]
-        req_bg = rq['blood_group_needed']
-        req_city = rq.get('city', None)
-        req_state = rq.get('state', None)
-        urg = rq.get('urgency', None)
-        req_coords = CITY_COORDS.get(req_city) or CITY_COORDS.get(req_state) or (0.0, 0.0)
-        urg_score = urgency_score(urg)
-
-        donors = pd.read_sql("SELECT * FROM donors", conn)
-        if donors.empty:
-            return jsonify({"error": "No donors found"}), 404
-
-        candidates = []
-        for _, d in donors.iterrows():
-            donor_city = d.get('city', None)
-            donor_state = d.get('state', None)
-            donor_coords = CITY_COORDS.get(donor_city) or CITY_COORDS.get(donor_state) or (0.0, 0.0)
-
-            dist = haversine_km(donor_coords[0], donor_coords[1], req_coords[0], req_coords[1])
-
-            # months_since_first_donation may be missing or string; try to coerce
-            months_since = d.get('months_since_first_donation', 0)
-            try:
-                months_since = float(months_since)
-            except Exception:
-                months_since = 0.0
-            days_since = int(months_since * 30)
-
-            blood_match = blood_compatible(d.get('blood_group', ''), req_bg)
-
-            feat = [
-                blood_match,
-                dist,
-                urg_score,
-                days_since,
-                1 if str(d.get('availability', '')).strip().lower() in ("yes", "y", "true") else 0,
-                int(d.get('number_of_donation', 0) or 0),
-                int(d.get('pints_donated', 0) or 0)
-            ]
-            candidates.append((d, feat, blood_match, dist))
-
-        # Scoring via models (if available), otherwise simple heuristic
-        Xc = np.array([c[1] for c in candidates])
-        if tree is not None and logreg is not None:
-            try:
-                probs_tree = tree.predict_proba(Xc)[:, 1]
-            except Exception:
-                probs_tree = tree.predict(Xc)
-            try:
-                probs_log = logreg.predict_proba(Xc)[:, 1]
-            except Exception:
-                probs_log = logreg.predict(Xc)
-            scores = (np.array(probs_tree) + np.array(probs_log)) / 2.0
-        else:
-            # Simple heuristic if models missing: prefer blood_match, availability, closeness, donation history
-            scores = []
-            for i, (donor, feat, blood_match, dist) in enumerate(candidates):
-                score = (blood_match * 2.0) + (feat[4] * 1.0) + max(0, (100 - dist) / 100) + (feat[5] * 0.1)
-                scores.append(score)
-            scores = np.array(scores, dtype=float)
-
-        # Build ranked list
-        ranked = []
-        for i, (donor, feat, blood_match, dist) in enumerate(candidates):
-            ranked.append({
-                "donor_id": int(donor.get('donor_id', 0)),
-                "name": donor.get('name', ''),
-                "city": donor.get('city', ''),
-                "state": donor.get('state', ''),
-                "blood_group": donor.get('blood_group', ''),
-                "availability": donor.get('availability', ''),
-                "score": float(scores[i]),
-                "distance_km": float(dist),
-                "blood_match": int(blood_match)
-            })
-
-        # Filter by radius
-        nearby = [d for d in ranked if d["distance_km"] <= radius]
-        candidate_pool = nearby if nearby else ranked
-
-        # Sort by blood_match first, then score
-        final_list = sorted(
-            candidate_pool,
-            key=lambda x: (x['blood_match'], x['score']),
-            reverse=True
-        )[:10]
-
-        # Save matches to DB (avoid duplicates)
-        try:
-            cursor = conn.cursor()
-            for donor in final_list:
-                # Check if match already exists
-                cursor.execute(
-                    "SELECT COUNT(1) FROM matches WHERE request_id = %s AND donor_id = %s",
-                    (request_id, donor["donor_id"])
-                )
-                exists = cursor.fetchone()[0] > 0
-                if not exists:
-                    cursor.execute(
-                        "INSERT INTO matches (request_id, donor_id, match_score) VALUES (%s, %s, %s)",
-                        (request_id, donor["donor_id"], donor["score"])
-                    )
-            conn.commit()
-            cursor.close()
-        except Exception as e:
-            # do not fail the whole request if saving matches fails; log and continue
-            print(f"⚠️ Could not save matches to DB: {e}")
+        cursor.execute("INSERT INTO notifications (request_id, donor_id) VALUES " + values +
+                       " ON DUPLICATE KEY UPDATE notified_at = CURRENT_TIMESTAMP", params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
 
-        return jsonify({
-            "request_id": int(request_id),
-            "blood_group_needed": req_bg,
-            "city": req_city,
-            "urgency": urg,
-            "radius_used_km": radius,
-            "top_donors": final_list
-        })
+@app.route("/match/<int:request_id>/notify", methods=["POST"])
+def notify_matched_donors(request_id):
+    """
+    Match a request (as /match/<id>) and email its top donors, several at once
+    over pooled SMTP sessions. Donors already emailed about this request (the
+    notifications table) are skipped, so repeating the POST only reaches new ones.
+    Query params: radius and k, as for /match/<id>.
+    Returns per-donor results: {"donor_id", "to_email", "ok", "error"?}.
+    """
+    radius = float(request.args.get("radius", 50.0))
+    k = min(max(request.args.get("k", DEFAULT_MATCH_K, type=int), 1), MAX_MATCH_K)
+    try:
+        body, status = _notify_request(request_id, radius, k)
+    except PoolTimeout as e:
+        return jsonify({"error": f"DB connection failed: {str(e)}"}), 503
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+    return jsonify(body), status
+
+def _notify_request(request_id, radius, k):
+    """Body and status of POST /match/<id>/notify (blocking: DB, then SMTP, then DB)."""
+    if not notifier.sender:
+        return {"error": "Email is not configured (set SENDER_EMAIL)"}, 503
+
+    view = _snapshot_view()
+    with db_pool.connection() as conn:
+        body, status = _run_match(conn, view, request_id, radius, k)
+        if status != 200:
+            return body, status
+        donor_ids = [int(d["donor_id"]) for d in body["top_donors"]]
+        already = _notified_donors(conn, request_id, donor_ids)
+        contacts = _donor_contacts(conn, [d for d in donor_ids if d not in already])
+    # the DB connection is back in the pool before any email goes out
+    results = notifier.send_many(match_messages(body, contacts))
+
+    sent_ids = [r["donor_id"] for r in results if r["ok"]]
+    try:
+        with db_pool.connection() as conn:
+            _record_notified(conn, request_id, sent_ids)
+    except Exception as e:
+        # the emails are out; a failed record only means a repeat POST may email these donors again
+        print(f"⚠️ Could not record notifications for request {request_id}: {e}")
+    return {
+        "request_id": request_id,
+        "sent": len(sent_ids),
+        "failed": len(results) - len(sent_ids),
+        "already_notified": len(already),
+        "without_email": len(donor_ids) - len(already) - len(results),
+        "results": results,
+    }, 200
+
+def _match_batch(conn, view, request_ids, radius, k):
+    """
+    Match several requests with one scoring pass; returns {"results": [...], "errors": [...]}.
+    `view` comes from _snapshot_view().
+    """
+    scorer, model_version = model_registry.current()
+
+    # Serve what we can from the match cache first
+    results_by_id = {}
+    if view is not None:
+        _sync_match_cache(view.version)
+        for rid in request_ids:
+            body = match_cache.get(_match_cache_key(rid, radius, k, view.version, model_version))
+            if body is not None:
+                results_by_id[rid] = body
+    todo = [rid for rid in request_ids if rid not in results_by_id]
+
+    contexts = {}
+    if todo:
+        placeholders = ", ".join(["%s"] * len(todo))
+        rqs = fetch_all(conn, f"SELECT {REQUEST_MATCH_COLUMNS} FROM requests WHERE request_id IN ({placeholders})",
+                        tuple(todo))
+        for rq in rqs:
+            ctx = _request_context(rq)
+            contexts[ctx["request_id"]] = ctx
+
+    if view is None:
+        view = DonorView(fetch_batch_candidates(
+            conn, [(c["blood_group_needed"], c["location_id"]) for c in contexts.values()], radius))
+
+    # Stack every request's candidate features; one segment of rows per request
+    errors, segments, blocks = [], [], []
+    for rid in todo:
+        ctx = contexts.get(rid)
+        if ctx is None:
+            errors.append({"request_id": rid, "error": f"No request found with id {rid}"})
+            continue
+        seg_view, rows, dists, radius_used = _find_candidates(conn, view, ctx, radius, k)
+        if len(rows) == 0:
+            errors.append({"request_id": rid,
+                           "error": f"No donors compatible with {ctx['blood_group_needed']} found"})
+            continue
+        X, blood_match = seg_view.index(DonorFeatures).matrix(
+            rows, ctx["blood_group_needed"], dists, ctx["urg_score"])
+        segments.append((ctx, seg_view, rows, dists, blood_match, radius_used))
+        blocks.append(X)
+
+    if segments:
+        # one model call over every request's candidates
+        scores = score_candidates(np.concatenate(blocks), scorer)
+
+        start, ranked = 0, []
+        for ctx, seg_view, rows, dists, blood_match, radius_used in segments:
+            seg_scores = scores[start:start + len(rows)]
+            start += len(rows)
+            final_list = rank_donors(seg_view.donors, rows, seg_scores, blood_match, dists, limit=k)
+            ranked.append((ctx["request_id"], final_list))
+            body = _match_response(ctx, radius_used, seg_view.version, model_version, final_list)
+            results_by_id[ctx["request_id"]] = body
+            if seg_view.version is not None:
+                key = _match_cache_key(ctx["request_id"], radius, k, seg_view.version, model_version)
+                match_cache.set(key, body)
+        _save_matches(conn, ranked)
+
+    results = [results_by_id[rid] for rid in request_ids if rid in results_by_id]
+    return {"results": results, "errors": errors}
+
+@app.route("/match/batch", methods=["POST"])
+def match_batch():
+    """
+    Match several requests in one pass.
+    JSON body:
+      - request_ids: list of request ids (at most MAX_BATCH_REQUESTS)
+      - radius (km): optional, default 50
+      - k: optional, donors per request (default 10, max MAX_MATCH_K)
+
+    Candidates of every request are stacked into one feature matrix and scored
+    with a single model call, then ranked per request.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        request_ids = list(dict.fromkeys(int(r) for r in data.get("request_ids") or []))
+        radius = float(data.get("radius", 50.0))
+        k = min(max(int(data.get("k", DEFAULT_MATCH_K)), 1), MAX_MATCH_K)
+    except (TypeError, ValueError):
+        return jsonify({"error": "request_ids must be a list of integers; radius and k must be numbers."}), 400
+    if not request_ids:
+        return jsonify({"error": "Please provide a JSON body with a non-empty 'request_ids' list."}), 400
+    if len(request_ids) > MAX_BATCH_REQUESTS:
+        return jsonify({"error": f"At most {MAX_BATCH_REQUESTS} requests per batch."}), 400
 
+    try:
+        view = _snapshot_view()
+        with db_pool.connection() as conn:
+            body = _match_batch(conn, view, request_ids, radius, k)
+        return jsonify(body)
+    except PoolTimeout as e:
+        return jsonify({"error": f"DB connection failed: {str(e)}"}), 503
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        if conn:
-            conn.close()
+
+@app.route("/match/jobs/<job_id>", methods=["GET"])
+def match_job_status(job_id):
+    """Status of a background match job; includes the saved top donors once done."""
+    job = match_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": f"No match job found with id {job_id}"}), 404
+
+    body = {"job_id": job["job_id"], "request_id": job["request_id"], "status": job["status"]}
+    if job["status"] == "done":
+        body.update(job["result"])
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    return jsonify(body)
 
 # -----------------------
 # Fetch matches for a request
 # -----------------------
+MATCH_COLUMNS = ("match_id", "request_id", "donor_id", "match_score", "status", "created_at")
+
+def _match_row(row):
+    """A matches row (tuple in MATCH_COLUMNS order) as a JSON-ready dict."""
+    out = dict(zip(MATCH_COLUMNS, row))
+    if isinstance(out["created_at"], (datetime.datetime, datetime.date)):
+        out["created_at"] = out["created_at"].isoformat()
+    return out
+
+def _matches_page_query(request_id, after_match_id, limit=None):
+    # keyset pagination over idx_matches_request_match: no OFFSET scans, stable under inserts
+    sql = f"SELECT {', '.join(MATCH_COLUMNS)} FROM matches WHERE request_id = %s AND match_id > %s ORDER BY match_id"
+    params = [request_id, after_match_id]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, tuple(params)
+
+def _stream_matches(conn, cursor, first_rows):
+    """Yield NDJSON lines from an unbuffered cursor, fetching MATCH_STREAM_CHUNK rows at a time."""
+    try:
+        rows = first_rows
+        while rows:
+            for row in rows:
+                yield json.dumps(_match_row(row), default=str) + "\n"
+            rows = cursor.fetchmany(MATCH_STREAM_CHUNK)
+    finally:
+        # the client may disconnect mid-stream, leaving unread rows behind
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
 @app.route("/matches/request/<int:request_id>", methods=["GET"])
 def get_matches_for_request(request_id):
-    try:
-        conn = safe_connect()
-    except Exception as e:
-        return jsonify({"error": f"DB connection failed: {str(e)}"}), 500
+    """
+    Saved matches for a request.
+
+    Query params:
+      - limit: page size (max MAX_MATCHES_PAGE); returns {"matches": [...], "next_after_match_id": ...}
+      - after_match_id: keyset cursor, the next_after_match_id of the previous page
+      - format=ndjson (or Accept: application/x-ndjson): stream one match per line from a
+        server-side cursor; honours after_match_id and limit
+    Without any of them, returns every match as one JSON array.
+    """
+    after_match_id = request.args.get("after_match_id", type=int)
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_MATCHES_PAGE)
+    stream = request.args.get("format") == "ndjson" or \
+        request.accept_mimetypes.best == "application/x-ndjson"
+
+    if stream:
+        try:
+            # not a `with` block: the response generator owns the connection and closes it
+            conn = db_pool.connect()
+        except Exception as e:
+            return jsonify({"error": f"DB connection failed: {str(e)}"}), 503
+        cursor = None
+        try:
+            cursor = conn.cursor(buffered=False)
+            cursor.execute(*_matches_page_query(request_id, after_match_id or 0, limit))
+            first_rows = cursor.fetchmany(min(MATCH_STREAM_CHUNK, limit or MATCH_STREAM_CHUNK))
+        except Exception as e:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+            return jsonify({"error": f"Error reading matches: {str(e)}"}), 500
+        if not first_rows and after_match_id is None:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": f"No matches found for request {request_id}"}), 404
+        return Response(_stream_matches(conn, cursor, first_rows), mimetype="application/x-ndjson")
+
+    if limit is not None or after_match_id is not None:
+        page_size = limit or MAX_MATCHES_PAGE
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(*_matches_page_query(request_id, after_match_id or 0, page_size))
+                matches = [_match_row(row) for row in cursor.fetchall()]
+                cursor.close()
+        except Exception as e:
+            return jsonify({"error": f"Error reading matches: {str(e)}"}), 500
+        if not matches and after_match_id is None:
+            return jsonify({"error": f"No matches found for request {request_id}"}), 404
+        return jsonify({
+            "request_id": request_id,
+            "matches": matches,
+            "next_after_match_id": matches[-1]["match_id"] if len(matches) == page_size else None,
+        })
 
     try:
-        df = pd.read_sql("SELECT * FROM matches WHERE request_id = %s", conn, params=(request_id,))
-        if df.empty:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(*_matches_page_query(request_id, 0))
+            matches = [_match_row(row) for row in cursor.fetchall()]
+            cursor.close()
+        if not matches:
             return jsonify({"error": f"No matches found for request {request_id}"}), 404
-        return df.to_json(orient="records")
+        return jsonify(matches)
     except Exception as e:
         return jsonify({"error": f"Error reading matches: {str(e)}"}), 500
-    finally:
-        conn.close()
 
 # -----------------------
 # Run
 # -----------------------
+def check_match_key():
+    """Warn at startup when `matches` lacks the unique key match saves rely on."""
+    try:
+        with db_pool.connection() as conn:
+            if not has_match_key(conn):
+                print("⚠️ matches has no UNIQUE (request_id, donor_id) key: every match save adds "
+                      "duplicate rows. Run migrate_matches.sql.")
+    except Exception as e:
+        print(f"⚠️ Could not check the matches table: {e}")
+
 if __name__ == "__main__":
+    check_match_key()
+    if DONOR_SNAPSHOT_ENABLED:
+        try:
+            donor_snapshot.refresh(full=True)
+            print(f"✅ Donor snapshot loaded: {donor_snapshot.stats()['donors']} donors")
+        except Exception as e:
+            print(f"⚠️ Could not preload donor snapshot (will retry on first match): {e}")
     # debug=True for local dev; set to False in production
     app.run(host="0.0.0.0", port=5000, debug=True)
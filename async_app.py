@@ -0,0 +1,551 @@
+# async_app.py
+"""
+asyncio serving mode (aiohttp + aiomysql) for the same API as app.py.
+
+One event loop serves every connection. Database round trips are awaited on
+an aiomysql pool instead of holding a thread each, and CPU-bound work runs on
+executors: ranking on ASYNC_CPU_WORKERS threads, bcrypt on the PasswordHasher
+pool, and chatbot replies on threads waiting for the model process. Config,
+donor snapshot, model registry, match cache, match jobs and the request
+helpers are shared with app.py, so both servers answer the same way.
+
+    pip install aiohttp aiomysql   # not in requirements.txt: app.py does not need them
+    python async_app.py            # serves on ASYNC_PORT (default 5001)
+
+Compare it against the Flask app with bench_async.py before deploying it.
+Status: no gain has been shown on the routes that motivated it. The
+database-bound routes (/match, /matches, /api/*) have not been benchmarked
+against MySQL yet. Without a database, /metrics ran 1.8-3.1x the Flask
+throughput at 1-64 clients; /chatbot was equal up to 16 clients and far
+slower at 64 (20 vs 582 req/s): Flask answered most of those with the
+"busy" reply, while here ASYNC_LLM_WORKERS queued them for a real answer.
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+import aiomysql
+from aiohttp import web
+
+import app as sync_app
+from app import (
+    DB_CONFIG, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DEFAULT_MATCH_K, MAX_MATCH_K, MAX_BATCH_REQUESTS, MAX_MATCHES_PAGE, MATCH_STREAM_CHUNK,
+    MATCH_PERSIST_ASYNC, REQUEST_MATCH_COLUMNS,
+    INSERT_DONOR_SQL, INSERT_USER_SQL, LOGIN_SQL, INSERT_REQUEST_SQL,
+    donor_snapshot, match_cache, match_jobs, match_writer, model_registry, notifier, password_hasher,
+    _donor_values, _login_payload, _request_values, _request_created,
+    _request_context, _rank_request, _match_response, _match_cache_key, _sync_match_cache,
+    _match_row, _matches_page_query,
+)
+from db import PoolTimeout
+from hashing import HasherBusy
+from match_writer import match_rows, upsert_statements
+
+# -----------------------
+# Config
+# -----------------------
+ASYNC_PORT = int(os.environ.get('ASYNC_PORT', 5001))
+# Threads for candidate search + scoring (NumPy releases the GIL for most of it)
+ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', os.cpu_count() or 2))
+# Threads waiting on chatbot replies from the model process (which queues and bounds them itself)
+ASYNC_LLM_WORKERS = int(os.environ.get('ASYNC_LLM_WORKERS', 16))
+
+cpu_executor = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix="async-cpu")
+llm_executor = ThreadPoolExecutor(max_workers=ASYNC_LLM_WORKERS, thread_name_prefix="async-llm")
+
+DB_POOL = web.AppKey("db_pool", aiomysql.Pool)
+
+_dumps = partial(json.dumps, default=str)
+
+
+def json_response(body, status=200, headers=None):
+    return web.json_response(body, status=status, headers=headers, dumps=_dumps)
+
+
+async def _json_body(request):
+    """Request JSON as a dict; {} when missing or malformed (like get_json(silent=True))."""
+    try:
+        data = await request.json()
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _query_int(request, name, default=None):
+    try:
+        return int(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+# -----------------------
+# Database (aiomysql)
+# -----------------------
+async def create_db_pool():
+    # autocommit: reads leave no transaction open when the connection goes back to the pool;
+    # writes that span several statements begin() explicitly
+    return await aiomysql.create_pool(
+        host=DB_CONFIG["host"],
+        user=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        db=DB_CONFIG["database"],
+        minsize=DB_POOL_SIZE,
+        maxsize=DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW,
+        pool_recycle=int(DB_POOL_RECYCLE) if DB_POOL_RECYCLE else -1,
+        autocommit=True,
+    )
+
+
+@asynccontextmanager
+async def connection(request):
+    """async with connection(request) as conn: ... (asyncio.TimeoutError after DB_POOL_TIMEOUT)."""
+    pool = request.app[DB_POOL]
+    conn = await asyncio.wait_for(pool.acquire(), DB_POOL_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+async def fetch_one(request, sql, params=()):
+    """The first row of a query as a dict, or None (db.fetch_one for aiomysql)."""
+    async with connection(request) as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+    return rows[0] if rows else None
+
+
+async def execute_insert(request, sql, params):
+    """Run one INSERT; returns the new row's id."""
+    async with connection(request) as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return cursor.lastrowid
+
+
+async def save_match_rows(request, rows):
+    """match_writer.save_match_rows over aiomysql: every chunk in one transaction."""
+    async with connection(request) as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cursor:
+                for sql, params in upsert_statements(rows):
+                    await cursor.execute(sql, params)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+    return len(rows)
+
+
+async def run_blocking(fn, *args, executor=None):
+    """Run a blocking call on `executor` (default: the loop's I/O thread pool)."""
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+
+
+# -----------------------
+# Middleware
+# -----------------------
+@web.middleware
+async def cors_middleware(request, handler):
+    # same as CORS(app) in app.py: any origin, for mobile app testing
+    if request.method == "OPTIONS":
+        response = web.Response()
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = request.headers.get(
+            "Access-Control-Request-Headers", "Content-Type, Authorization")
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+# -----------------------
+# Routes
+# -----------------------
+routes = web.RouteTableDef()
+
+
+@routes.get("/")
+async def home(request):
+    return json_response({"msg": "Rakth Sathi API is running (async)",
+                          "chatbot_available": sync_app.CHATBOT_AVAILABLE})
+
+
+@routes.get("/metrics")
+async def metrics(request):
+    pool = request.app[DB_POOL]
+    return json_response({
+        "db_pool": {"size": pool.size, "free": pool.freesize, "max_size": pool.maxsize},
+        "password_hasher": password_hasher.stats(),
+        "donor_snapshot": donor_snapshot.stats(),
+        "match_cache": match_cache.stats(),
+        "match_writer": match_writer.stats(),
+        "match_jobs": match_jobs.stats(),
+        "models": model_registry.stats(),
+        "notifier": notifier.stats(),
+        "chatbot": sync_app.chatbot_stats() if sync_app.CHATBOT_AVAILABLE else None,
+    })
+
+
+@routes.post("/chatbot")
+async def chatbot_route(request):
+    if not sync_app.CHATBOT_AVAILABLE:
+        return json_response({"error": "Chatbot helper is not available on server."}, 500)
+
+    data = await _json_body(request)
+    if "message" not in data:
+        return json_response({"error": "Please provide a JSON body with 'message' field."}, 400)
+
+    session_id = sync_app._chat_session_id(request.headers.get("Authorization"), data)
+    if request.query.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", ""):
+        return await _stream_chat(request, data["message"], session_id)
+    try:
+        reply = await run_blocking(sync_app.get_bot_reply, data["message"], session_id, executor=llm_executor)
+        return json_response({"reply": reply})
+    except Exception as e:
+        return json_response({"error": f"Chatbot error: {str(e)}"}, 500)
+
+
+async def _stream_chat(request, user_msg, session_id):
+    """app._chat_events over aiohttp; each next() of the blocking generator runs on llm_executor."""
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", **sync_app.SSE_HEADERS})
+    await response.prepare(request)
+    events = sync_app._chat_events(user_msg, session_id)
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        while True:
+            # shielded: cancelling the handler must not hide a next() still running on the executor
+            pending = loop.run_in_executor(llm_executor, next, events, None)
+            event = await asyncio.shield(pending)
+            pending = None
+            if event is None:
+                break
+            await response.write(event.encode("utf-8"))
+        await response.write_eof()
+    except ConnectionResetError:
+        pass  # the client hung up mid-stream
+    finally:
+        # a client that went away stops the generation in the model process
+        if pending is None:
+            await run_blocking(events.close, executor=llm_executor)
+        else:
+            # closing while next() runs raises "generator already executing"; close once it returns
+            pending.add_done_callback(partial(_close_events, events))
+    return response
+
+
+def _close_events(events, finished):
+    if not finished.cancelled():
+        finished.exception()  # nobody is waiting for the event any more
+    llm_executor.submit(events.close)
+
+
+@routes.post("/api/donor/register")
+async def api_register_donor(request):
+    data = await _json_body(request)
+    try:
+        donor_id = await execute_insert(request, INSERT_DONOR_SQL, _donor_values(data))
+        donor_snapshot.mark_stale()
+        return json_response({"donor_id": donor_id})
+    except Exception as e:
+        return json_response({"error": f"Could not register donor: {str(e)}"}, 500)
+
+
+async def _await_hash(future):
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), password_hasher.timeout)
+    except asyncio.TimeoutError:
+        raise password_hasher.busy(f"password hashing took longer than {password_hasher.timeout:.1f}s")
+
+
+@routes.post("/api/auth/register")
+async def api_auth_register(request):
+    data = await _json_body(request)
+    email = (data.get('email') or '').strip().lower()
+    password = data.get('password') or ''
+    name = data.get('name') or ''
+    if not email or not password:
+        return json_response({'error': 'Email and password are required.'}, 400)
+
+    try:
+        pw_hash = await _await_hash(password_hasher.submit_hash(password))
+        user_id = await execute_insert(request, INSERT_USER_SQL, (email, pw_hash, name))
+        return json_response({'user_id': user_id})
+    except HasherBusy as e:
+        return json_response({'error': f'Server busy, please retry: {str(e)}'}, 503, {'Retry-After': '1'})
+    except Exception as e:
+        return json_response({'error': f'Could not create user: {str(e)}'}, 500)
+
+
+@routes.post("/api/auth/login")
+async def api_auth_login(request):
+    data = await _json_body(request)
+    email = (data.get('email') or '').strip().lower()
+    password = data.get('password') or ''
+    if not email or not password:
+        return json_response({'error': 'Email and password required.'}, 400)
+
+    try:
+        row = await fetch_one(request, LOGIN_SQL, (email,))
+        if row is None:
+            return json_response({'error': 'Invalid credentials.'}, 401)
+        if not await _await_hash(password_hasher.submit_check(password, row['password_hash'])):
+            return json_response({'error': 'Invalid credentials.'}, 401)
+        return json_response(_login_payload(row))
+    except HasherBusy as e:
+        return json_response({'error': f'Server busy, please retry: {str(e)}'}, 503, {'Retry-After': '1'})
+    except Exception as e:
+        return json_response({'error': f'Login error: {str(e)}'}, 500)
+
+
+@routes.post("/api/request/create")
+async def api_create_request(request):
+    data = await _json_body(request)
+    values = _request_values(data)
+    try:
+        request_id = await execute_insert(request, INSERT_REQUEST_SQL, values)
+        urgency, radius_km = values[5], values[6]
+        return json_response(_request_created(request_id, urgency, radius_km))
+    except Exception as e:
+        return json_response({"error": f"Could not create request: {str(e)}"}, 500)
+
+
+async def _run_match(request, request_id, radius, k):
+    """app._run_match with awaited DB calls and ranking on cpu_executor. Returns (body, status)."""
+    scorer, model_version = model_registry.current()
+
+    # the snapshot may have to refresh from MySQL (blocking), so get() runs off the loop
+    view = await run_blocking(donor_snapshot.get)
+    _sync_match_cache(view.version)
+    cache_key = _match_cache_key(request_id, radius, k, view.version, model_version)
+    cached = match_cache.get(cache_key)
+    if cached is not None:
+        return cached, 200
+
+    rq = await fetch_one(request, f"SELECT {REQUEST_MATCH_COLUMNS} FROM requests WHERE request_id = %s",
+                         (request_id,))
+    if rq is None:
+        return {"error": f"No request found with id {request_id}"}, 404
+    if view.donors.empty:
+        return {"error": "No donors found"}, 404
+
+    ctx = _request_context(rq)
+    view, final_list, radius_used = await run_blocking(
+        _rank_request, None, view, ctx, radius, k, scorer, executor=cpu_executor)
+    if final_list is None:
+        return {"error": f"No donors compatible with {ctx['blood_group_needed']} found"}, 404
+
+    rows = match_rows(request_id, final_list)
+    if rows and not (MATCH_PERSIST_ASYNC and match_writer.submit(rows)):
+        try:
+            await save_match_rows(request, rows)
+        except Exception as e:
+            print(f"⚠️ Could not save matches to DB: {e}")
+
+    body = _match_response(ctx, radius_used, view.version, model_version, final_list)
+    match_cache.set(cache_key, body)
+    return body, 200
+
+
+def _pooled_match(fn, *args):
+    """Run an app.py match helper that needs a blocking connection from app.db_pool."""
+    view = sync_app._snapshot_view()  # before the checkout: a refresh takes a connection too
+    with sync_app.db_pool.connection() as conn:
+        return fn(conn, view, *args)
+
+
+@routes.get("/match/{request_id:\\d+}")
+async def match_request(request):
+    request_id = int(request.match_info["request_id"])
+    try:
+        radius = float(request.query.get("radius", 50.0))
+    except ValueError:
+        radius = 50.0
+    k = min(max(_query_int(request, "k", DEFAULT_MATCH_K), 1), MAX_MATCH_K)
+
+    try:
+        if sync_app.DONOR_SNAPSHOT_ENABLED:
+            body, status = await _run_match(request, request_id, radius, k)
+        else:
+            # SQL pushdown runs its candidate queries through mysql.connector on a worker thread
+            body, status = await run_blocking(_pooled_match, sync_app._run_match, request_id, radius, k,
+                                              executor=cpu_executor)
+        return json_response(body, status)
+    except (asyncio.TimeoutError, PoolTimeout) as e:
+        return json_response({"error": f"DB connection failed: {str(e) or 'pool timeout'}"}, 503)
+    except Exception as e:
+        return json_response({"error": f"An error occurred: {str(e)}"}, 500)
+
+
+@routes.post("/match/batch")
+async def match_batch(request):
+    data = await _json_body(request)
+    try:
+        request_ids = list(dict.fromkeys(int(r) for r in data.get("request_ids") or []))
+        radius = float(data.get("radius", 50.0))
+        k = min(max(int(data.get("k", DEFAULT_MATCH_K)), 1), MAX_MATCH_K)
+    except (TypeError, ValueError):
+        return json_response({"error": "request_ids must be a list of integers; radius and k must be numbers."}, 400)
+    if not request_ids:
+        return json_response({"error": "Please provide a JSON body with a non-empty 'request_ids' list."}, 400)
+    if len(request_ids) > MAX_BATCH_REQUESTS:
+        return json_response({"error": f"At most {MAX_BATCH_REQUESTS} requests per batch."}, 400)
+
+    try:
+        # one batch is mostly a single large scoring pass; run app.py's version whole
+        body = await run_blocking(_pooled_match, sync_app._match_batch, request_ids, radius, k,
+                                  executor=cpu_executor)
+        return json_response(body)
+    except PoolTimeout as e:
+        return json_response({"error": f"DB connection failed: {str(e)}"}, 503)
+    except Exception as e:
+        return json_response({"error": f"An error occurred: {str(e)}"}, 500)
+
+
+@routes.post("/match/{request_id:\\d+}/notify")
+async def notify_matched_donors(request):
+    """app.notify_matched_donors: match, then email the top donors not emailed before."""
+    request_id = int(request.match_info["request_id"])
+    try:
+        radius = float(request.query.get("radius", 50.0))
+    except ValueError:
+        radius = 50.0
+    k = min(max(_query_int(request, "k", DEFAULT_MATCH_K), 1), MAX_MATCH_K)
+    try:
+        # blocking end to end (mysql.connector, then pooled SMTP sessions); one I/O thread per call
+        body, status = await run_blocking(sync_app._notify_request, request_id, radius, k)
+        return json_response(body, status)
+    except PoolTimeout as e:
+        return json_response({"error": f"DB connection failed: {str(e)}"}, 503)
+    except Exception as e:
+        return json_response({"error": f"An error occurred: {str(e)}"}, 500)
+
+
+@routes.get("/match/jobs/{job_id}")
+async def match_job_status(request):
+    job_id = request.match_info["job_id"]
+    job = match_jobs.status(job_id)
+    if job is None:
+        return json_response({"error": f"No match job found with id {job_id}"}, 404)
+
+    body = {"job_id": job["job_id"], "request_id": job["request_id"], "status": job["status"]}
+    if job["status"] == "done":
+        body.update(job["result"])
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    return json_response(body)
+
+
+async def _stream_matches(request, request_id, after_match_id, limit):
+    """NDJSON from an unbuffered (SS) cursor, MATCH_STREAM_CHUNK rows per fetch."""
+    pool = request.app[DB_POOL]
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), DB_POOL_TIMEOUT)
+    except Exception as e:
+        return json_response({"error": f"DB connection failed: {str(e) or 'pool timeout'}"}, 503)
+
+    cursor, response = None, None
+    try:
+        cursor = await conn.cursor(aiomysql.SSCursor)
+        await cursor.execute(*_matches_page_query(request_id, after_match_id or 0, limit))
+        rows = await cursor.fetchmany(min(MATCH_STREAM_CHUNK, limit or MATCH_STREAM_CHUNK))
+        if not rows and after_match_id is None:
+            return json_response({"error": f"No matches found for request {request_id}"}, 404)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        while rows:
+            await response.write("".join(_dumps(_match_row(row)) + "\n" for row in rows).encode("utf-8"))
+            rows = await cursor.fetchmany(MATCH_STREAM_CHUNK)
+        await response.write_eof()
+        return response
+    except Exception as e:
+        if response is None:
+            return json_response({"error": f"Error reading matches: {str(e)}"}, 500)
+        # headers are already out; the client sees a truncated stream
+        print(f"⚠️ Match stream for request {request_id} aborted: {e}")
+        conn.close()
+        return response
+    finally:
+        # the client may disconnect mid-stream, leaving unread rows behind
+        if cursor is not None and not conn.closed:
+            try:
+                await cursor.close()
+            except Exception:
+                conn.close()
+        pool.release(conn)
+
+
+@routes.get("/matches/request/{request_id:\\d+}")
+async def get_matches_for_request(request):
+    """Same query params as app.get_matches_for_request (limit, after_match_id, format=ndjson)."""
+    request_id = int(request.match_info["request_id"])
+    after_match_id = _query_int(request, "after_match_id")
+    limit = _query_int(request, "limit")
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_MATCHES_PAGE)
+    stream = request.query.get("format") == "ndjson" or \
+        "application/x-ndjson" in request.headers.get("Accept", "")
+
+    if stream:
+        return await _stream_matches(request, request_id, after_match_id, limit)
+
+    paged = limit is not None or after_match_id is not None
+    page_size = (limit or MAX_MATCHES_PAGE) if paged else None
+    try:
+        async with connection(request) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(*_matches_page_query(request_id, after_match_id or 0, page_size))
+                matches = [_match_row(row) for row in await cursor.fetchall()]
+    except Exception as e:
+        return json_response({"error": f"Error reading matches: {str(e)}"}, 500)
+
+    if not matches and after_match_id is None:
+        return json_response({"error": f"No matches found for request {request_id}"}, 404)
+    if not paged:
+        return json_response(matches)
+    return json_response({
+        "request_id": request_id,
+        "matches": matches,
+        "next_after_match_id": matches[-1]["match_id"] if len(matches) == page_size else None,
+    })
+
+
+# -----------------------
+# App
+# -----------------------
+async def _on_startup(app):
+    app[DB_POOL] = await create_db_pool()
+    await run_blocking(sync_app.check_match_key)
+    if sync_app.DONOR_SNAPSHOT_ENABLED:
+        try:
+            await run_blocking(donor_snapshot.refresh, True)
+            print(f"✅ Donor snapshot loaded: {donor_snapshot.stats()['donors']} donors")
+        except Exception as e:
+            print(f"⚠️ Could not preload donor snapshot (will retry on first match): {e}")
+
+
+async def _on_cleanup(app):
+    app[DB_POOL].close()
+    await app[DB_POOL].wait_closed()
+    cpu_executor.shutdown(wait=False)
+    llm_executor.shutdown(wait=False)
+
+
+def create_app():
+    app = web.Application(middlewares=[cors_middleware])
+    app.add_routes(routes)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="0.0.0.0", port=ASYNC_PORT)
@@ -0,0 +1,121 @@
+# bench_async.py
+"""
+Local load test: the Flask app (app.py) vs the asyncio app (async_app.py).
+
+Start both against the same database, then:
+
+    python app.py                  # :5000
+    python async_app.py            # :5001
+    python bench_async.py --path "/matches/request/1?limit=100" --concurrency 1,16,64,256
+    python bench_async.py --path /chatbot --method POST --body '{"message": "Who can donate?"}'
+
+For each concurrency level, N client threads send requests back to back for
+--duration seconds; the table shows throughput and latency percentiles for
+each server. Only the standard library is used, so the client is the same for
+both servers.
+
+Recorded so far (no database, DB_POOL_SIZE=0, LLM_MODEL=stub:step_ms=20,tokens=20,
+CHAT_CACHE_SIZE=0, 5 s per level); the database-bound routes are still unmeasured:
+
+    GET /metrics     c=1: sync 692 / async 1275 req/s   c=16: 700 / 1421   c=64: 550 / 1706
+    POST /chatbot    c=1: sync 2.3 / async 2.4 req/s    c=16: 19.6 / 19.7  c=64: 582 / 19.9
+                     (at c=64 sync answered 48 of 64 chats with the "busy" reply)
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    i = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def run_level(url, concurrency, duration, method="GET", body=None, timeout=30.0):
+    """Hammer `url` from `concurrency` threads for `duration` seconds."""
+    data = body.encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if data is not None else {}
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        mine, failed = [], 0
+        while time.monotonic() < stop_at:
+            req = urllib.request.Request(url, data=data, headers=headers, method=method)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+                mine.append(time.perf_counter() - started)
+            except urllib.error.HTTPError as e:
+                e.read()
+                # 4xx/5xx still measure the server's round trip, but are reported separately
+                mine.append(time.perf_counter() - started)
+                failed += 1
+            except Exception:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": 1000 * _percentile(latencies, 0.50),
+        "p99_ms": 1000 * _percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--async-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--path", default="/matches/request/1?limit=100")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", default=None, help="JSON request body (implies Content-Type: application/json)")
+    parser.add_argument("--concurrency", default="1,16,64,256", help="comma-separated client thread counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level and server")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    servers = [("sync", args.sync_url), ("async", args.async_url)]
+    results = []
+    for concurrency in levels:
+        for name, base in servers:
+            r = run_level(base.rstrip("/") + args.path, concurrency, args.duration, args.method, args.body)
+            r.update(server=name, concurrency=concurrency)
+            results.append(r)
+            if not args.json:
+                print(f"{name:>5}  c={concurrency:<4}  {r['rps']:9.1f} req/s  p50 {r['p50_ms']:8.1f} ms  "
+                      f"p99 {r['p99_ms']:8.1f} ms  errors {r['errors']}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print()
+    by_key = {(r["server"], r["concurrency"]): r for r in results}
+    for concurrency in levels:
+        s, a = by_key[("sync", concurrency)], by_key[("async", concurrency)]
+        gain = a["rps"] / s["rps"] if s["rps"] else float("inf")
+        print(f"c={concurrency:<4}  async/sync throughput x{gain:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# bench_llm.py
+"""
+Load test for the chatbot worker (llm_worker.py) with the stub model, so no
+weights are needed:
+
+    python bench_llm.py                                  # max batch 1, 4 and 8
+    python bench_llm.py --clients 32 --batch 1,16 --wait-ms 20
+    python bench_llm.py --heavy 24                       # plus one user flooding the queue
+    python bench_llm.py --model "stub:step_ms=30,seq_ms=1,tokens=60"
+
+Each of --clients users sends --requests prompts back to back from its own
+thread; with --heavy K, one more user fires K prompts at once. For each max
+batch size a fresh worker is started and the table shows throughput, latency
+percentiles, and the median latency of the ordinary users alone (round-robin
+scheduling keeps it close to the no-flood figure). max batch 1 is the old
+one-prompt-at-a-time behaviour.
+"""
+import argparse
+import threading
+import time
+
+from llm_worker import LLMWorker
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    i = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def run_config(model, max_batch, wait_ms, clients, requests, heavy, max_tokens):
+    worker = LLMWorker(model, max_queue=clients + heavy + 1, timeout=300, max_tokens=max_tokens,
+                       max_batch=max_batch, max_wait=wait_ms / 1000)
+    worker.start()
+    worker.generate("warm up")  # waits for the model to load
+
+    latencies = {"light": [], "heavy": []}
+    errors = []
+    lock = threading.Lock()
+
+    def client(user, kind, count):
+        mine, failed = [], 0
+        for i in range(count):
+            started = time.perf_counter()
+            try:
+                worker.generate(f"{user} question {i}: can I donate blood?", user=user)
+                mine.append(time.perf_counter() - started)
+            except Exception:
+                failed += 1
+        with lock:
+            latencies[kind].extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(f"user-{n}", "light", requests), daemon=True)
+               for n in range(clients)]
+    # the flood shares one user id, so round robin serves it between everyone else's prompts
+    threads += [threading.Thread(target=client, args=("heavy", "heavy", 1), daemon=True)
+                for _ in range(heavy)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    stats = worker.stats()
+    worker.stop()
+
+    both = sorted(latencies["light"] + latencies["heavy"])
+    light = sorted(latencies["light"])
+    return {
+        "requests": len(both),
+        "errors": sum(errors),
+        "rps": len(both) / elapsed if elapsed else 0.0,
+        "p50_ms": 1000 * _percentile(both, 0.50),
+        "p99_ms": 1000 * _percentile(both, 0.99),
+        "light_p50_ms": 1000 * _percentile(light, 0.50),
+        "batched": stats["batched"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="stub:step_ms=20,seq_ms=2,tokens=20")
+    parser.add_argument("--batch", default="1,4,8", help="comma-separated max batch sizes")
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=5, help="prompts per client")
+    parser.add_argument("--heavy", type=int, default=0, help="prompts fired at once by one flooding user")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.model}: {args.clients} clients x {args.requests} prompts"
+          + (f" + {args.heavy} from one user" if args.heavy else ""))
+    print(f"{'max batch':>9} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'users p50':>10} {'batched':>8} {'errors':>6}")
+    baseline = None
+    for max_batch in [int(b) for b in args.batch.split(",") if b.strip()]:
+        r = run_config(args.model, max_batch, args.wait_ms, args.clients, args.requests, args.heavy, args.max_tokens)
+        baseline = baseline or r["rps"]
+        print(f"{max_batch:>9} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r['light_p50_ms']:>10.1f} {r['batched']:>8} {r['errors']:>6}"
+              f"   x{r['rps'] / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
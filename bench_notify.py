@@ -0,0 +1,75 @@
+# bench_notify.py
+"""
+Emailing matched donors: send_email() per message vs Notifier.send_many(),
+both against the local SMTP stand-in (smtp_stub.py), so no provider is needed:
+
+    python bench_notify.py
+    python bench_notify.py --recipients 10 --delay-ms 40 --pool 4 --reject 1
+
+--delay-ms is added to every SMTP reply to stand in for network round trips.
+send_email() pays the whole handshake (connect, EHLO, login, QUIT) for every
+message, one after another; send_many() sends over pooled sessions, --pool at
+a time, and later rounds reuse the sessions the first one opened. The last
+--reject recipients are refused by the stand-in, to show per-recipient errors.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import send_email
+from notifier import Notifier, SMTPPool
+from smtp_stub import SMTPStub
+
+SENDER = "rakthsathi@example.com"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=20.0)
+    parser.add_argument("--pool", type=int, default=4)
+    parser.add_argument("--reject", type=int, default=1, help="recipients the stand-in refuses")
+    parser.add_argument("--rounds", type=int, default=3, help="send_many rounds over the same pool")
+    args = parser.parse_args()
+
+    addresses = [f"donor{i}@example.com" for i in range(args.recipients)]
+    rejected = addresses[len(addresses) - args.reject:] if args.reject else []
+    stub = SMTPStub(delay_ms=args.delay_ms, reject=rejected).start()
+    print(f"{args.recipients} recipients ({len(rejected)} refused), {args.delay_ms:.0f} ms per SMTP reply")
+
+    # send_email() as the app used it: one connection per message, in sequence
+    send_email.SMTP_HOST, send_email.SMTP_PORT, send_email.SMTP_STARTTLS = "127.0.0.1", stub.port, False
+    send_email.SENDER_EMAIL, send_email.SENDER_APP_PASSWORD = SENDER, "app-password"
+    before = stub.stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, to in enumerate(addresses):
+            send_email.send_email(to, f"Donor {i}", "Blood needed", "A patient needs O+ blood.", "High")
+    elapsed = time.perf_counter() - started
+    print(f"send_email loop      {1000 * elapsed:8.1f} ms   "
+          f"connections {stub.stats()['connections'] - before['connections']}")
+
+    pool = SMTPPool("127.0.0.1", stub.port, SENDER, "app-password", size=args.pool, starttls=False)
+    notifier = Notifier(pool, SENDER)
+    messages = [{"donor_id": i, "to_email": to, "recipient_name": f"Donor {i}", "subject": "Blood needed",
+                 "body": "A patient needs O+ blood.", "urgency": "High"} for i, to in enumerate(addresses)]
+    for round_no in range(1, args.rounds + 1):
+        before = stub.stats()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # its failure summary; shown below instead
+            results = notifier.send_many(messages)
+        elapsed = time.perf_counter() - started
+        ok = sum(1 for r in results if r["ok"])
+        print(f"send_many round {round_no}    {1000 * elapsed:8.1f} ms   "
+              f"connections {stub.stats()['connections'] - before['connections']}   sent {ok}/{len(results)}")
+    for r in results:
+        if not r["ok"]:
+            print(f"  refused: {r['to_email']}: {r['error']}")
+    print(notifier.stats())
+    notifier.close()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# blood_groups.py
+"""
+Blood group compatibility rules, shared by matching and the chatbot.
+
+DONOR_TO_RECIPIENTS is the source table; RECIPIENT_TO_DONORS is derived from it
+once at import so lookups never rebuild anything.
+"""
+
+BLOOD_GROUPS = ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+']
+
+# donor group -> recipient groups it can give to
+DONOR_TO_RECIPIENTS = {
+    'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+    'O+': ['O+', 'A+', 'B+', 'AB+'],
+    'A-': ['A-', 'A+', 'AB-', 'AB+'],
+    'A+': ['A+', 'AB+'],
+    'B-': ['B-', 'B+', 'AB-', 'AB+'],
+    'B+': ['B+', 'AB+'],
+    'AB-': ['AB-', 'AB+'],
+    'AB+': ['AB+']
+}
+
+# recipient group -> donor groups it can receive from (in BLOOD_GROUPS order)
+RECIPIENT_TO_DONORS = {
+    recipient: [donor for donor in BLOOD_GROUPS if recipient in DONOR_TO_RECIPIENTS[donor]]
+    for recipient in BLOOD_GROUPS
+}
+
+
+def blood_compatible(donor_bg, req_bg):
+    return 1 if req_bg in DONOR_TO_RECIPIENTS.get(donor_bg, ()) else 0
+
+
+def compatible_donor_groups(req_bg):
+    """Donor blood groups that can give to req_bg."""
+    return RECIPIENT_TO_DONORS.get(req_bg, [])
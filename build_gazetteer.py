@@ -0,0 +1,122 @@
+# build_gazetteer.py
+"""
+Rebuild data/gazetteer_distances.npy from data/gazetteer.csv, optionally after
+importing towns from a GeoNames dump first.
+
+    python build_gazetteer.py
+    python build_gazetteer.py --geonames IN.txt --admin1 admin1CodesASCII.txt --min-population 5000
+
+GeoNames files: https://download.geonames.org/export/dump/ (IN.zip or
+citiesN.zip, plus admin1CodesASCII.txt for state names). Entries already in
+the CSV (and their aliases) are kept; imported towns are appended after them
+by descending population.
+"""
+import argparse
+import csv
+import os
+
+from gazetteer import (
+    DISTANCE_TABLE_FILE, GAZETTEER_FILE, Gazetteer, normalize_name, save_distance_table,
+)
+
+CSV_COLUMNS = ["name", "state", "kind", "lat", "lon", "aliases"]
+
+# GeoNames "geoname" table columns we use
+GN_NAME, GN_ASCII, GN_LAT, GN_LON, GN_CLASS, GN_CODE, GN_COUNTRY, GN_ADMIN1, GN_POPULATION = \
+    1, 2, 4, 5, 6, 7, 8, 10, 14
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def read_admin1(path, country):
+    """admin1 code ("IN.40") -> state name."""
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2 and parts[0].startswith(country + "."):
+                names[parts[0].split(".", 1)[1]] = parts[1]
+    return names
+
+
+def import_geonames(rows, geonames_path, admin1_path, country="IN", min_population=5000):
+    """Append populated places from a GeoNames dump to gazetteer `rows`."""
+    states = read_admin1(admin1_path, country)
+    existing = {(normalize_name(r["name"]), normalize_name(r["state"])) for r in rows if r["kind"] == "city"}
+    known_states = {normalize_name(r["state"]) for r in rows if r["kind"] == "state"}
+
+    towns = []
+    with open(geonames_path, encoding="utf-8") as f:
+        for line in f:
+            p = line.rstrip("\n").split("\t")
+            if len(p) < 15 or p[GN_CLASS] != "P" or p[GN_COUNTRY] != country:
+                continue
+            population = int(p[GN_POPULATION] or 0)
+            state = states.get(p[GN_ADMIN1])
+            if population < min_population or not state:
+                continue
+            towns.append((population, p, state))
+    towns.sort(key=lambda t: -t[0])
+
+    added = 0
+    for population, p, state in towns:
+        key = (normalize_name(p[GN_NAME]), normalize_name(state))
+        if key in existing:
+            continue
+        existing.add(key)
+        aliases = p[GN_ASCII] if p[GN_ASCII] != p[GN_NAME] else ""
+        rows.append({"name": p[GN_NAME], "state": state, "kind": "city",
+                     "lat": p[GN_LAT], "lon": p[GN_LON], "aliases": aliases})
+        added += 1
+
+    # states we have no fallback point for get their seat (PPLA), else their largest town
+    seats = {}
+    for population, p, state in towns:
+        state_key = normalize_name(state)
+        if state_key in known_states:
+            continue
+        if state_key not in seats or (p[GN_CODE] == "PPLA" and seats[state_key][1][GN_CODE] != "PPLA"):
+            seats[state_key] = (state, p)
+    for state, p in seats.values():
+        rows.append({"name": state, "state": state, "kind": "state",
+                     "lat": p[GN_LAT], "lon": p[GN_LON], "aliases": ""})
+    return added
+
+
+def write_rows(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({c: row.get(c) or "" for c in CSV_COLUMNS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gazetteer", default=GAZETTEER_FILE)
+    parser.add_argument("--distances", default=DISTANCE_TABLE_FILE)
+    parser.add_argument("--geonames", help="GeoNames dump (IN.txt, cities5000.txt, ...)")
+    parser.add_argument("--admin1", help="GeoNames admin1CodesASCII.txt")
+    parser.add_argument("--country", default="IN")
+    parser.add_argument("--min-population", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.geonames:
+        if not args.admin1:
+            parser.error("--geonames needs --admin1")
+        rows = read_rows(args.gazetteer) if os.path.exists(args.gazetteer) else []
+        added = import_geonames(rows, args.geonames, args.admin1, args.country, args.min_population)
+        write_rows(rows, args.gazetteer)
+        print(f"✅ Imported {added} towns from {args.geonames} into {args.gazetteer}")
+
+    gazetteer = Gazetteer.from_csv(args.gazetteer, None)
+    table = save_distance_table(gazetteer, args.distances)
+    print(f"✅ {len(gazetteer)} locations, distance table {table.shape} "
+          f"({table.nbytes / 1e6:.1f} MB) saved to {args.distances}")
+
+
+if __name__ == "__main__":
+    main()
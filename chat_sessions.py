@@ -0,0 +1,137 @@
+# chat_sessions.py
+"""
+Per-session chatbot conversation memory.
+
+Each session (a logged-in user or a client session id) keeps its last
+`max_turns` exchanges in a ring buffer, together with the prompt text those
+turns render to, so a new prompt is the shared system prefix + the session's
+prebuilt history + the new question rather than a rebuild of every turn.
+
+Sessions are kept in LRU order and dropped when there are more than
+`max_sessions`, when they have been idle for `idle_ttl` seconds, or when the
+approximate memory of all sessions exceeds `max_bytes`.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+# rough fixed cost of one session (dict slot, deque, object) on top of its text
+SESSION_OVERHEAD_BYTES = 600
+
+
+def render_turn(user, bot):
+    return f"User: {user}\nAssistant: {bot}\n"
+
+
+class _Session:
+    __slots__ = ("turns", "history_text", "nbytes", "last_used")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (user, bot, rendered, rendered_bytes)
+        self.history_text = ""
+        self.nbytes = SESSION_OVERHEAD_BYTES
+        self.last_used = time.monotonic()
+
+    def append(self, user, bot):
+        rendered = render_turn(user, bot)
+        self.turns.append((user, bot, rendered, len(rendered.encode("utf-8"))))
+        self.history_text = "".join(t[2] for t in self.turns)
+        # each turn's text is held twice: on its own and inside history_text
+        self.nbytes = SESSION_OVERHEAD_BYTES + 2 * sum(t[3] for t in self.turns)
+
+
+class SessionStore:
+    """
+    max_turns     -- exchanges remembered per session
+    max_sessions  -- sessions kept; the least recently used go first
+    idle_ttl      -- seconds without a message before a session is forgotten (None: never)
+    max_bytes     -- approximate memory budget for all sessions (None: unlimited)
+    """
+
+    def __init__(self, max_turns=3, max_sessions=10000, idle_ttl=1800.0, max_bytes=None):
+        self.max_turns = int(max_turns)
+        self.max_sessions = int(max_sessions)
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # session_id -> _Session, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # counters for stats()
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self.evicted_budget = 0
+
+    def history(self, session_id):
+        """(turns, history_text) for a session; turns are (user, bot) pairs, oldest first."""
+        if session_id is None:
+            return (), ""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return (), ""
+            return tuple((t[0], t[1]) for t in session.turns), session.history_text
+
+    def append(self, session_id, user, bot):
+        """Remember one exchange (no-op without a session id)."""
+        if session_id is None or self.max_turns <= 0:
+            return
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_turns)
+            else:
+                self._bytes -= session.nbytes
+            session.append(user, bot)
+            session.last_used = time.monotonic()
+            self._bytes += session.nbytes
+            self._sessions.move_to_end(session_id)
+            self._expire()
+            while len(self._sessions) > self.max_sessions:
+                self._drop_oldest()
+                self.evicted_lru += 1
+            while self.max_bytes is not None and self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._drop_oldest()
+                self.evicted_budget += 1
+
+    def forget(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.nbytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_turns": self.max_turns,
+                "idle_ttl_seconds": self.idle_ttl,
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evicted_lru": self.evicted_lru,
+                "evicted_idle": self.evicted_idle,
+                "evicted_budget": self.evicted_budget,
+            }
+
+    # caller holds self._lock for both
+    def _expire(self):
+        # LRU order is last-used order, so idle sessions are all at the front
+        if self.idle_ttl is None:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._drop_oldest()
+            self.evicted_idle += 1
+
+    def _drop_oldest(self):
+        _, session = self._sessions.popitem(last=False)
+        self._bytes -= session.nbytes
@@ -1,12 +1,35 @@
 # chatbot_helper.py
-from gpt4all import GPT4All
+import atexit
+import os
 import re
 
+from blood_groups import RECIPIENT_TO_DONORS
+from chat_sessions import SessionStore
+from faq_index import load_faq_index
+from llm_worker import LLMBusy, LLMError, LLMWorker
+from reply_cache import ReplyCache, namespace_of
+
 # -----------------------
-# GPT4All model setup
+# GPT4All model (runs in its own process, see llm_worker.py)
 # -----------------------
-MODEL_PATH = r"C:\Users\madhu\AppData\Local\nomic.ai\GPT4All\gpt4all-falcon-newbpe-q4_0.gguf"
-model = GPT4All(MODEL_PATH)
+# Path to a local GPT4All model file, e.g. gpt4all-falcon-newbpe-q4_0.gguf ("stub" for load tests).
+# Models are never downloaded: without one, rule and FAQ answers still work and
+# questions that need the model get ERROR_REPLY.
+MODEL_PATH = os.environ.get('LLM_MODEL', '')
+MODEL_CONFIGURED = MODEL_PATH == "stub" or MODEL_PATH.startswith("stub:") or os.path.isfile(MODEL_PATH)
+if not MODEL_CONFIGURED:
+    print(f"⚠️ No local model configured (LLM_MODEL={MODEL_PATH!r}): the chatbot only gives rule and FAQ answers")
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', 16))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+LLM_MAX_TOKENS = int(os.environ.get('LLM_MAX_TOKENS', 200))
+# Prompts per model call and how long the first one waits for company (see llm_batcher.py);
+# GPT4All generates one prompt at a time, so these only matter for batching backends
+LLM_MAX_BATCH = int(os.environ.get('LLM_MAX_BATCH', 4))
+LLM_BATCH_WAIT_MS = float(os.environ.get('LLM_BATCH_WAIT_MS', 10))
+
+# Started on the first question that needs the model
+llm_worker = LLMWorker(MODEL_PATH, max_queue=LLM_MAX_QUEUE, timeout=LLM_TIMEOUT, max_tokens=LLM_MAX_TOKENS,
+                       max_batch=LLM_MAX_BATCH, max_wait=LLM_BATCH_WAIT_MS / 1000)
 
 system_prompt = """You are Rakth Sathi Assistant.
 You help users with blood donation questions as well as questions about the Rakth Sathi app.
@@ -17,94 +40,173 @@ You can answer general questions, chat casually, tell facts, jokes, and provide
 You do not provide medical advice.
 Always be friendly and helpful."""
 
+# -----------------------
+# Reply cache (see reply_cache.py): repeat questions skip the model.
+# CHAT_CACHE_SIZE=0 disables it; set CHAT_CACHE_FILE to keep it across restarts.
+# -----------------------
+CHAT_CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE', 1024))
+CHAT_CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', 7 * 24 * 3600))
+CHAT_CACHE_FILE = os.environ.get('CHAT_CACHE_FILE') or None
+
+reply_cache = ReplyCache(
+    maxsize=CHAT_CACHE_SIZE,
+    ttl=CHAT_CACHE_TTL,
+    path=CHAT_CACHE_FILE,
+    namespace=namespace_of(MODEL_PATH, system_prompt, LLM_MAX_TOKENS),
+)
+reply_cache.load()
+atexit.register(reply_cache.save)
+
 # -----------------------
 # Short conversation memory
 # -----------------------
+# Per session (logged-in user or client session id), see chat_sessions.py
 MAX_HISTORY = 3  # last N messages to remember
-conversation_history_list = []  # stores tuples (user, bot)
+CHAT_MAX_SESSIONS = int(os.environ.get('CHAT_MAX_SESSIONS', 10000))
+CHAT_SESSION_TTL = float(os.environ.get('CHAT_SESSION_TTL', 1800))  # idle seconds before a session is forgotten
+CHAT_MEMORY_BUDGET_MB = float(os.environ.get('CHAT_MEMORY_BUDGET_MB', 64))
+
+chat_sessions = SessionStore(
+    max_turns=MAX_HISTORY,
+    max_sessions=CHAT_MAX_SESSIONS,
+    idle_ttl=CHAT_SESSION_TTL,
+    max_bytes=int(CHAT_MEMORY_BUDGET_MB * 1024 * 1024),
+)
+PROMPT_PREFIX = system_prompt + "\n"
 
 # -----------------------
 # Blood donation rules
 # -----------------------
 def blood_compatible_info(target_bg):
-    compat = {
-        "O-": ["O-"],
-        "O+": ["O-", "O+"],
-        "A-": ["O-", "A-"],
-        "A+": ["O-", "O+", "A-", "A+"],
-        "B-": ["O-", "B-"],
-        "B+": ["O-", "O+", "B-", "B+"],
-        "AB-": ["O-", "A-", "B-", "AB-"],
-        "AB+": ["O-", "O+", "A-", "A+", "B-", "B+", "AB-", "AB+"]
-    }
-    return compat.get(target_bg.upper(), [])
+    # same table the matcher uses (blood_groups.py)
+    return RECIPIENT_TO_DONORS.get(target_bg.upper(), [])
+
+_BLOOD_GROUP = re.compile(r'(?<![A-Z])(AB|A|B|O)[+-]')
 
 def common_blood_questions(user_message):
-    msg = user_message.lower()
-    # Periods
-    if "period" in msg or "menstrual" in msg:
-        return "Yes, you can donate blood during your menstrual cycle as long as you are feeling well. Check with your local blood donation center for specifics."
-    # Cold
-    if "cold" in msg:
-        return "It is usually recommended to wait until your cold symptoms have cleared before donating blood."
-    # Fever
-    if "fever" in msg:
-        return "You should not donate blood if you have a fever. Wait until you are fully recovered."
-    # Blood group compatibility
-    match = re.search(r'([ABO]{1,2}[+-])', user_message.upper())
+    # Blood group compatibility (computed, so not part of the FAQ corpus)
+    match = _BLOOD_GROUP.search(user_message.upper())
     if match:
-        target_bg = match.group(1)
+        target_bg = match.group(0)
         donors = blood_compatible_info(target_bg)
         return f"Individuals with the following blood groups can donate to {target_bg}: {', '.join(donors)}"
     return None
 
 # -----------------------
-# Rakth Sathi app FAQ rules
+# Eligibility and Rakth Sathi app FAQ (see faq_index.py, data/faq.json)
 # -----------------------
+faq_index = load_faq_index()
+
 def rakth_sathi_faq(user_message):
-    msg = user_message.lower()
-    if "trust" in msg or "safe" in msg or "reliable" in msg:
-        return ("Rakth Sathi is a trusted platform that connects blood donors with recipients. "
-                "All donor information is handled securely and privacy is maintained.")
-    if "how to register" in msg or "sign up" in msg:
-        return "You can register in Rakth Sathi by filling the signup form in the app with your basic information and blood group."
-    if "features" in msg or "services" in msg:
-        return "Rakth Sathi allows you to find blood donors nearby, check donor availability, track donations, and get reminders for your next donation."
-    if "what is rakth sathi" in msg or "about rakth sathi" in msg:
-        return "Rakth Sathi is a platform that connects blood donors with people in need, helping ensure timely blood donations and supporting donor awareness."
-    return None
+    if faq_index is None:
+        return None
+    match = faq_index.lookup(user_message)
+    return match.answer if match is not None else None
+
+def instant_answer(user_message):
+    """Rule or FAQ answer that needs no model call, or None."""
+    return common_blood_questions(user_message) or rakth_sathi_faq(user_message)
 
 # -----------------------
 # Main function
 # -----------------------
-def get_bot_reply(user_message):
-    global conversation_history_list
+BUSY_REPLY = "The assistant is busy right now, please try again in a moment."
+ERROR_REPLY = "Sorry, I am unable to answer right now."
+
+def get_bot_reply(user_message, session_id=None):
+    """
+    Reply to one chat message. session_id selects the conversation memory
+    used for follow-ups; without one the message is answered on its own.
+    """
     try:
-        # 1️⃣ Check for blood donation rules
-        rule_answer = common_blood_questions(user_message)
-        if rule_answer:
-            return rule_answer
+        # 1️⃣ Blood group compatibility, then the eligibility / app FAQ index
+        answer = instant_answer(user_message)
+        if answer:
+            return answer
 
-        # 2️⃣ Check Rakth Sathi FAQ rules
-        rakth_answer = rakth_sathi_faq(user_message)
-        if rakth_answer:
-            return rakth_answer
+        # 2️⃣ Same question, same history: reuse the earlier GPT4All reply
+        history, history_text = chat_sessions.history(session_id)
+        cached = reply_cache.get(user_message, history)
+        if cached is not None:
+            chat_sessions.append(session_id, user_message, cached)
+            return cached
 
-        # 3️⃣ GPT4All fallback
-        prompt_context = ""
-        for u, b in conversation_history_list[-MAX_HISTORY:]:
-            prompt_context += f"User: {u}\nAssistant: {b}\n"
-        prompt_context += f"User: {user_message}\nAssistant:"
+        # 3️⃣ GPT4All fallback (queued to the worker process)
+        _require_model()
+        reply = llm_worker.generate(build_prompt(history_text, user_message), user=session_id).strip()
+        _remember(session_id, user_message, reply, history)
+        return reply
 
-        prompt = system_prompt + "\n" + prompt_context
+    except LLMBusy as e:
+        print("GPT4All busy:", e)
+        return BUSY_REPLY
+    except Exception as e:
+        print("GPT4All error:", e)
+        return ERROR_REPLY
 
-        # Generate GPT4All response
-        reply = model.generate(prompt, max_tokens=200)
 
-        # Save to conversation history
-        conversation_history_list.append((user_message, reply.strip()))
-        return reply.strip()
+def stream_bot_reply(user_message, session_id=None):
+    """
+    get_bot_reply, yielding the reply in pieces as GPT4All generates it.
+    Rule, FAQ and cached answers arrive as a single piece.
+    """
+    answer = instant_answer(user_message)
+    if answer:
+        yield answer
+        return
 
+    history, history_text = chat_sessions.history(session_id)
+    cached = reply_cache.get(user_message, history)
+    if cached is not None:
+        chat_sessions.append(session_id, user_message, cached)
+        yield cached
+        return
+
+    pieces = []
+    try:
+        _require_model()
+        for token in llm_worker.stream(build_prompt(history_text, user_message), user=session_id):
+            if not pieces:
+                token = token.lstrip()  # get_bot_reply strips the reply; match it
+                if not token:
+                    continue
+            pieces.append(token)
+            yield token
+    except LLMBusy as e:
+        print("GPT4All busy:", e)
+        if not pieces:
+            yield BUSY_REPLY
+        return
     except Exception as e:
         print("GPT4All error:", e)
-        return "Sorry, I am unable to answer right now."
+        if not pieces:
+            yield ERROR_REPLY
+        return
+    # only complete replies are cached and remembered (a client that disconnects never gets here)
+    _remember(session_id, user_message, "".join(pieces).strip(), history)
+
+
+def _require_model():
+    if not MODEL_CONFIGURED:
+        raise LLMError("no local model configured")
+
+
+def build_prompt(history_text, user_message):
+    """System prompt + the session's prebuilt history text + the new question."""
+    return f"{PROMPT_PREFIX}{history_text}User: {user_message}\nAssistant:"
+
+
+def _remember(session_id, user_message, reply, history):
+    reply_cache.set(user_message, reply, history)
+    # Save to the session's conversation history
+    chat_sessions.append(session_id, user_message, reply)
+
+
+def chatbot_stats():
+    return {
+        "model_configured": MODEL_CONFIGURED,
+        "worker": llm_worker.stats(),
+        "faq": faq_index.stats() if faq_index is not None else None,
+        "reply_cache": reply_cache.stats(),
+        "sessions": chat_sessions.stats(),
+    }
@@ -0,0 +1,33 @@
+# compile_models.py
+"""
+Compile models/tree_matcher.joblib + models/logreg_matcher.joblib (from
+train_models.py) into models/matcher_compiled.npz, which app.py scores with
+plain NumPy. Run it again after retraining.
+"""
+import os
+
+import numpy as np
+from joblib import load
+
+from scorer import COMPILE_TOLERANCE, SklearnScorer, compile_models, file_digest, sample_features
+
+TREE_FILE = os.path.join("models", "tree_matcher.joblib")
+LOGREG_FILE = os.path.join("models", "logreg_matcher.joblib")
+COMPILED_FILE = os.path.join("models", "matcher_compiled.npz")
+
+
+def main():
+    tree, logreg = load(TREE_FILE), load(LOGREG_FILE)
+    compiled = compile_models(tree, logreg, source=file_digest(TREE_FILE, LOGREG_FILE))
+
+    X = sample_features()
+    max_err = float(np.max(np.abs(SklearnScorer(tree, logreg).score(X) - compiled.score(X))))
+    if max_err > COMPILE_TOLERANCE:
+        raise SystemExit(f"❌ Compiled scorer differs from sklearn by {max_err:g}; {COMPILED_FILE} not written")
+
+    compiled.save(COMPILED_FILE)
+    print(f"✅ {COMPILED_FILE} saved (tree depth {compiled.max_depth}, max |error| {max_err:.2e})")
+
+
+if __name__ == "__main__":
+    main()
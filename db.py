@@ -0,0 +1,254 @@
+# db.py
+"""
+MySQL connection pool.
+
+Opening a mysql.connector connection costs a TCP + TLS + auth handshake; the
+pool keeps up to `size` connections open and hands them out per request.
+
+fetch_one / fetch_all read small results straight from a cursor; DataFrames
+are only built where matching does columnar work on them (donor_store.py).
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's checkout timeout."""
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the underlying connection, except
+    close() returns it to the pool (so code written for safe_connect() keeps working).
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool with overflow.
+
+    connect       -- callable opening a new raw connection
+    size          -- connections kept open while idle
+    max_overflow  -- extra connections opened under load, closed again when returned
+    timeout       -- seconds to wait for a free connection before raising PoolTimeout
+    recycle       -- connections older than this many seconds are reopened on checkout
+                     (keep it below MySQL's wait_timeout); 0 disables
+    pre_ping      -- check the connection is alive on checkout and reopen it if not
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, timeout=10.0, recycle=3600.0, pre_ping=True):
+        self._connect = connect
+        self.size = int(size)
+        self.max_overflow = int(max_overflow)
+        self.timeout = float(timeout)
+        self.recycle = float(recycle)
+        self.pre_ping = pre_ping
+
+        self._idle = deque()  # (conn, created_at), most recently returned last
+        self._created_at = {}  # id(conn) -> created_at for checked-out connections
+        self._open = 0
+        self._checked_out = 0
+        self._cond = threading.Condition()
+
+        # counters for stats()
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.ping_failures = 0
+
+    @property
+    def capacity(self):
+        return self.size + self.max_overflow
+
+    @contextmanager
+    def connection(self):
+        """
+        with pool.connection() as conn: ...
+
+        The connection goes back to the pool on exit; any transaction still open
+        is rolled back first.
+        """
+        conn = self.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def connect(self):
+        """Check out a PooledConnection; close() it to give it back."""
+        return PooledConnection(self, self._checkout())
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "utilization": round(self._checked_out / self.capacity, 4) if self.capacity else None,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "ping_failures": self.ping_failures,
+            }
+
+    def dispose(self):
+        """Close every idle connection (checked-out ones close when returned)."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _checkout(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry, waited = None, False
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.capacity:
+                    self._open += 1  # reserve the slot; connect outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"no database connection free after {self.timeout:.1f}s "
+                                      f"({self._checked_out}/{self.capacity} in use)")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self._checked_out)
+            self.checkouts += 1
+            wait = time.monotonic() - start
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if waited:
+                self.waits += 1
+
+        try:
+            if entry is None:
+                conn, created_at = self._new_connection()
+            else:
+                conn, created_at = self._check(*entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created_at[id(conn)] = created_at
+        return conn
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self.created += 1
+        return conn, time.monotonic()
+
+    def _check(self, conn, created_at):
+        """Reopen `conn` if it is past its recycle age or fails the ping."""
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self.recycled += 1
+            self._close_quietly(conn)
+            return self._new_connection()
+        if self.pre_ping:
+            try:
+                alive = conn.is_connected()
+            except Exception:
+                alive = False
+            if not alive:
+                with self._cond:
+                    self.ping_failures += 1
+                self._close_quietly(conn)
+                return self._new_connection()
+        return conn, created_at
+
+    def _release(self, conn):
+        # end whatever transaction the borrower left open, so the next one sees fresh data
+        try:
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), time.monotonic())
+            self._checked_out -= 1
+            keep = healthy and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, created_at))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# -----------------------
+# Row access (plain cursors, no DataFrames)
+# -----------------------
+def _named_rows(cursor, rows):
+    names = [col[0] for col in cursor.description]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def fetch_all(conn, sql, params=()):
+    """Every row of a query as a dict keyed by column name."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return _named_rows(cursor, cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def fetch_one(conn, sql, params=()):
+    """The first row of a query as a dict, or None when there is none."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()  # drain the result so the connection is reusable
+        return _named_rows(cursor, rows[:1])[0] if rows else None
+    finally:
+        cursor.close()
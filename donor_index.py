@@ -0,0 +1,128 @@
+# donor_index.py
+"""
+Indexes over a donor snapshot, so matching only scores donors that can matter.
+"""
+import numpy as np
+
+from blood_groups import BLOOD_GROUPS, compatible_donor_groups
+from gazetteer import MAX_SEARCH_KM
+from matching import GAZETTEER, donor_column, donor_locations
+
+
+def _group_rows(keys):
+    """Return (unique keys, list of ascending row-index arrays, one per key)."""
+    uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(uniq)))[:-1]
+    return uniq, np.split(order, bounds)
+
+
+def _expanding_search(within, size, location, radius_km, min_results, growth):
+    radius = max(float(radius_km), 1.0)
+    while True:
+        rows, dists = within(location, radius)
+        if len(rows) >= min(min_results, size) or radius >= MAX_SEARCH_KM:
+            return rows, dists, radius
+        radius = min(radius * growth, MAX_SEARCH_KM)
+
+
+class SpatialIndex:
+    """
+    Donors grouped by gazetteer location id.
+
+    A radius query reads one row of the precomputed distance table (the request's
+    location) at the locations donors actually live in, so no distance is
+    computed at query time.
+    """
+
+    def __init__(self, location_ids, gazetteer=GAZETTEER):
+        self.gazetteer = gazetteer
+        self.size = len(location_ids)
+        if self.size:
+            self.locations, self.location_rows = _group_rows(np.asarray(location_ids, dtype=np.int64))
+        else:
+            self.locations, self.location_rows = np.zeros(0, dtype=np.int64), []
+
+    @classmethod
+    def from_donors(cls, donors):
+        return cls(donor_locations(donors))
+
+    def within(self, location, radius_km):
+        """
+        Donors within radius_km of a location id.
+
+        Returns (rows, dist): ascending snapshot row positions and their distances in km.
+        """
+        loc_dists = self.gazetteer.distances(location, self.locations)
+        hits = np.flatnonzero(loc_dists <= radius_km)
+        if not len(hits):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=float)
+
+        rows = np.concatenate([self.location_rows[i] for i in hits])
+        dists = np.concatenate([np.full(len(self.location_rows[i]), loc_dists[i]) for i in hits])
+        order = np.argsort(rows, kind="stable")
+        return rows[order], dists[order]
+
+    def expanding(self, location, radius_km, min_results=1, growth=2.0):
+        """
+        Expanding-ring search: grow the radius by `growth` until at least
+        `min_results` donors are found (or every donor is covered).
+
+        Returns (rows, dist, radius_km_used).
+        """
+        return _expanding_search(self.within, self.size, location, radius_km, min_results, growth)
+
+
+class BloodGroupIndex:
+    """
+    Donors partitioned by blood_group, with a SpatialIndex per partition.
+
+    Queries only visit the partitions that can give to the recipient's group
+    (blood_groups.RECIPIENT_TO_DONORS), so an O- request only ever looks at O- donors.
+    """
+
+    def __init__(self, blood_groups, location_ids, gazetteer=GAZETTEER):
+        blood_groups = np.asarray(blood_groups, dtype=object)
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        self.partitions = {}
+        self.spatial = {}
+        for bg in BLOOD_GROUPS:
+            rows = np.flatnonzero(blood_groups == bg)
+            if len(rows):
+                self.partitions[bg] = rows
+                self.spatial[bg] = SpatialIndex(location_ids[rows], gazetteer)
+
+    @classmethod
+    def from_donors(cls, donors):
+        return cls(donor_column(donors, "blood_group", None).to_numpy(dtype=object), donor_locations(donors))
+
+    def size_for(self, req_bg):
+        """Number of donors that can give to req_bg."""
+        return sum(len(self.partitions.get(bg, ())) for bg in compatible_donor_groups(req_bg))
+
+    def within(self, req_bg, location, radius_km):
+        """
+        Compatible donors within radius_km of a location id.
+
+        Returns (rows, dist): ascending snapshot row positions and their distances in km.
+        """
+        rows, dists = [], []
+        for bg in compatible_donor_groups(req_bg):
+            if bg not in self.partitions:
+                continue
+            local_rows, local_dists = self.spatial[bg].within(location, radius_km)
+            rows.append(self.partitions[bg][local_rows])
+            dists.append(local_dists)
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=float)
+
+        rows, dists = np.concatenate(rows), np.concatenate(dists)
+        order = np.argsort(rows, kind="stable")
+        return rows[order], dists[order]
+
+    def expanding(self, req_bg, location, radius_km, min_results=1, growth=2.0):
+        """Expanding-ring search over the compatible partitions; see SpatialIndex.expanding."""
+        def within(loc, r):
+            return self.within(req_bg, loc, r)
+        return _expanding_search(within, self.size_for(req_bg), location, radius_km, min_results, growth)
@@ -0,0 +1,275 @@
+# donor_store.py
+"""
+Resident donor snapshot.
+
+The donor table is loaded once and then kept fresh with small delta queries
+(new donor_ids plus rows whose updated_at moved), so matching never has to
+pull the whole table over the wire.
+"""
+import os
+import threading
+import time
+
+from blood_groups import BLOOD_GROUPS, compatible_donor_groups
+from matching import GAZETTEER
+
+# Only the columns matching reads (features + response fields)
+DONOR_MATCH_COLUMNS = (
+    "donor_id", "name", "city", "state", "blood_group", "availability",
+    "months_since_first_donation", "number_of_donation", "pints_donated",
+)
+# Location keys pushed into one candidate query; past this the query drops its location filter
+PUSHDOWN_MAX_LOCATION_KEYS = int(os.environ.get("PUSHDOWN_MAX_LOCATION_KEYS", "500"))
+
+
+class DonorView:
+    """
+    One immutable version of the donor table plus indexes built over it.
+
+    Indexes are built lazily, once per view, by passing a builder such as
+    SpatialIndex.from_donors to index().
+    """
+
+    def __init__(self, donors, version=None):
+        self.donors = donors
+        self.version = version
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, builder):
+        idx = self._indexes.get(builder)
+        if idx is None:
+            with self._lock:
+                idx = self._indexes.get(builder)
+                if idx is None:
+                    idx = builder(self.donors)
+                    self._indexes[builder] = idx
+        return idx
+
+
+class DonorSnapshot:
+    """
+    In-process copy of the donors table.
+
+    connect            -- callable returning a new DB connection (caller closes it)
+    max_staleness      -- seconds a snapshot may be served before a delta refresh
+    full_reload_every  -- seconds between full reloads (picks up deleted donors)
+    """
+
+    def __init__(self, connect, max_staleness=30.0, full_reload_every=3600.0):
+        self._connect = connect
+        self.max_staleness = float(max_staleness)
+        self.full_reload_every = float(full_reload_every)
+
+        self._lock = threading.Lock()
+        self._donors = None
+        self._view = None
+        self._version = 0
+        self._max_donor_id = 0
+        self._max_updated_at = None
+        self._has_updated_at = False
+        self._refreshed_at = 0.0
+        self._full_loaded_at = 0.0
+        self._stale = True
+
+        # counters for stats()
+        self.full_loads = 0
+        self.delta_loads = 0
+        self.delta_rows = 0
+
+    @property
+    def version(self):
+        """Bumped every time the snapshot's donor data changes."""
+        return self._version
+
+    def mark_stale(self):
+        """Force a delta refresh on the next read (e.g. right after a donor insert)."""
+        self._stale = True
+
+    def get(self):
+        """Return the current DonorView, refreshing first if the snapshot is stale."""
+        if self._needs_refresh():
+            with self._lock:
+                # another thread may have refreshed while we waited
+                if self._needs_refresh():
+                    self._refresh_locked()
+        return self._view
+
+    def refresh(self, full=False):
+        """Refresh now; a full reload if `full` or nothing is loaded yet."""
+        with self._lock:
+            self._refresh_locked(full=full)
+        return self._version
+
+    def stats(self):
+        return {
+            "version": self._version,
+            "donors": 0 if self._donors is None else int(len(self._donors)),
+            "age_seconds": round(time.time() - self._refreshed_at, 3) if self._refreshed_at else None,
+            "max_staleness_seconds": self.max_staleness,
+            "full_loads": self.full_loads,
+            "delta_loads": self.delta_loads,
+            "delta_rows": self.delta_rows,
+        }
+
+    # -----------------------
+    # internals
+    # -----------------------
+    def _needs_refresh(self):
+        return (
+            self._donors is None
+            or self._stale
+            or time.time() - self._refreshed_at >= self.max_staleness
+        )
+
+    def _refresh_locked(self, full=False):
+        now = time.time()
+        # cleared before querying, so a mark_stale() that lands mid-query forces another refresh
+        self._stale = False
+        try:
+            if self._donors is None or full or now - self._full_loaded_at >= self.full_reload_every:
+                self._full_load()
+            else:
+                self._delta_load()
+        except Exception:
+            self._stale = True
+            raise
+        # the data is as old as the query, not its completion
+        self._refreshed_at = now
+
+    def _full_load(self):
+        import pandas as pd  # imported on first use: it is the slowest part of app startup
+        conn = self._connect()
+        try:
+            donors = pd.read_sql("SELECT * FROM donors ORDER BY donor_id", conn)
+        finally:
+            conn.close()
+        self._has_updated_at = "updated_at" in donors.columns
+        self._full_loaded_at = time.time()
+        self._install(donors, self._version + 1)
+        self.full_loads += 1
+
+    def _delta_load(self):
+        import pandas as pd
+        query = "SELECT * FROM donors WHERE donor_id > %s"
+        params = [self._max_donor_id]
+        if self._has_updated_at and self._max_updated_at is not None:
+            # >= so rows updated within the watermark's second are not missed;
+            # re-reading an unchanged row does not bump the version
+            query += " OR updated_at >= %s"
+            params.append(self._max_updated_at)
+        query += " ORDER BY donor_id"
+
+        conn = self._connect()
+        try:
+            delta = pd.read_sql(query, conn, params=tuple(params))
+        finally:
+            conn.close()
+        self.delta_loads += 1
+        if delta.empty:
+            return
+
+        current = self._donors
+        known = current[current["donor_id"].isin(delta["donor_id"])]
+        if len(known) == len(delta) and _same_rows(known, delta):
+            return
+
+        self.delta_rows += len(delta)
+        merged = pd.concat(
+            [current[~current["donor_id"].isin(delta["donor_id"])], delta],
+            ignore_index=True,
+        )
+        merged = merged.sort_values("donor_id", kind="stable").reset_index(drop=True)
+        self._install(merged, self._version + 1)
+
+    def _install(self, donors, version):
+        import pandas as pd
+        self._donors = donors
+        self._version = version
+        self._view = DonorView(donors, version)
+        self._max_donor_id = int(donors["donor_id"].max()) if not donors.empty else 0
+        if self._has_updated_at and not donors.empty:
+            latest = donors["updated_at"].max()
+            self._max_updated_at = None if pd.isna(latest) else pd.Timestamp(latest).to_pydatetime()
+
+
+def _same_rows(known, delta):
+    """True if `delta` holds exactly the rows already in `known` (same ids, same values)."""
+    a = known.sort_values("donor_id").reset_index(drop=True)
+    b = delta.sort_values("donor_id").reset_index(drop=True)
+    if list(a.columns) != list(b.columns):
+        return False
+    return a.astype(object).where(a.notna(), None).equals(b.astype(object).where(b.notna(), None))
+
+
+# -----------------------
+# SQL pushdown (used when the snapshot is disabled)
+# -----------------------
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _normalized_sql(column):
+    """MySQL 8 expression for gazetteer.normalize_name(column) on ASCII names (accents are not stripped)."""
+    return f"TRIM(REGEXP_REPLACE(LOWER(REPLACE({column}, '&', ' and ')), '[^0-9a-z]+', ' '))"
+
+
+def build_match_query(donor_groups, near_keys=None):
+    """
+    Build (sql, params) fetching DONOR_MATCH_COLUMNS for donors in `donor_groups`.
+
+    near_keys is None (no location predicate) or the (city_keys, state_keys)
+    of Gazetteer.lookup_keys(); only donors whose normalized city or state is
+    one of them are returned. Returns None when no donor can match.
+    """
+    if not donor_groups or (near_keys is not None and not any(near_keys)):
+        return None
+
+    sql = f"SELECT {', '.join(DONOR_MATCH_COLUMNS)} FROM donors WHERE blood_group IN ({_placeholders(donor_groups)})"
+    params = list(donor_groups)
+    if near_keys is not None:
+        clauses = []
+        for column, keys in zip(("city", "state"), near_keys):
+            if keys:
+                clauses.append(f"{_normalized_sql(column)} IN ({_placeholders(keys)})")
+                params += list(keys)
+        sql += f" AND ({' OR '.join(clauses)})"
+    sql += " ORDER BY donor_id"
+    return sql, tuple(params)
+
+
+def fetch_batch_candidates(conn, requests, radius_km=None):
+    """
+    Fetch compatible donors that may lie within radius_km of any of `requests`,
+    a list of (req_bg, location_id) pairs, with one query.
+
+    The location predicate compares the same normalized keys snapshot mode
+    resolves, so it keeps every donor whose location is near; a few more
+    (a far town sharing a near town's name) are dropped by the caller's
+    exact distance check. radius_km=None fetches every compatible donor.
+    """
+    groups = set()
+    near = None if radius_km is None else set()
+    for req_bg, location in requests:
+        groups.update(compatible_donor_groups(req_bg))
+        if near is not None:
+            # an unknown request location has nothing within a finite radius
+            near.update(GAZETTEER.ids_within(location, radius_km).tolist())
+
+    import pandas as pd
+    donor_groups = [bg for bg in BLOOD_GROUPS if bg in groups]
+    near_keys = None
+    if near is not None:
+        near_keys = GAZETTEER.lookup_keys(near)
+        if len(near) == len(GAZETTEER) or sum(map(len, near_keys)) > PUSHDOWN_MAX_LOCATION_KEYS:
+            near_keys = None  # fetch every compatible donor; the caller's index still checks distance
+    query = build_match_query(donor_groups, near_keys)
+    if query is None:
+        return pd.DataFrame(columns=list(DONOR_MATCH_COLUMNS))
+    sql, params = query
+    return pd.read_sql(sql, conn, params=params)
+
+
+def fetch_match_candidates(conn, req_bg, location, radius_km=None):
+    """Single-request fetch_batch_candidates."""
+    return fetch_batch_candidates(conn, [(req_bg, location)], radius_km)
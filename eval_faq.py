@@ -0,0 +1,121 @@
+# eval_faq.py
+"""
+Offline evaluation of the FAQ intent index (faq_index.py).
+
+    python eval_faq.py                      # held-out results at FAQ_THRESHOLD / FAQ_MARGIN
+    python eval_faq.py --sweep              # tune threshold and margin on the tuning split
+    python eval_faq.py --verbose            # every held-out question with its best match
+
+Both files hold questions phrased differently from the corpus, each labelled
+with the intent that should answer it, or null when the question should go
+to the language model instead:
+
+    data/faq_tune.json  -- tuning split: --sweep picks threshold and margin here
+    data/faq_eval.json  -- held-out split: only ever reported on, never tuned on
+
+    hit rate   -- in-scope questions answered with the right intent
+    precision  -- answers that were the right intent
+    false hits -- out-of-scope questions answered anyway
+"""
+import argparse
+import json
+import os
+import time
+
+from faq_index import BASE_DIR, FAQ_FILE, FAQ_MARGIN, FAQ_THRESHOLD, FaqIndex
+
+TUNE_FILE = os.path.join(BASE_DIR, "data", "faq_tune.json")
+EVAL_FILE = os.path.join(BASE_DIR, "data", "faq_eval.json")
+# --sweep keeps the setting with the best tuning hit rate among those at least this precise
+MIN_PRECISION = 0.95
+
+
+def evaluate(index, cases, threshold, margin):
+    in_scope = [c for c in cases if c["intent"] is not None]
+    out_scope = [c for c in cases if c["intent"] is None]
+    correct = answered = false_hits = 0
+    for case in cases:
+        match = index.best(case["question"])
+        if not index.answers_with(match, threshold, margin):
+            continue
+        answered += 1
+        if case["intent"] is None:
+            false_hits += 1
+        elif match.intent == case["intent"]:
+            correct += 1
+    return {
+        "threshold": threshold,
+        "margin": margin,
+        "hit_rate": correct / len(in_scope) if in_scope else None,
+        "precision": correct / answered if answered else None,
+        "false_hits": false_hits,
+        "out_of_scope": len(out_scope),
+    }
+
+
+def sweep(index, cases):
+    """Every (threshold, margin) result on `cases`, and the one --sweep recommends."""
+    results = [evaluate(index, cases, round(0.20 + 0.05 * i, 2), round(0.02 * j, 2))
+               for i in range(11) for j in range(8)]
+    precise = [r for r in results if (r["precision"] or 0.0) >= MIN_PRECISION]
+    best = max(precise or results, key=lambda r: (r["hit_rate"], r["threshold"], r["margin"]))
+    return results, best
+
+
+def lookup_micros(index, cases, repeat=200):
+    questions = [c["question"] for c in cases]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            index.lookup(q)
+    return 1e6 * (time.perf_counter() - started) / (repeat * len(questions))
+
+
+def _report(label, r):
+    precision = f"{r['precision']:.1%}" if r["precision"] is not None else "-"
+    print(f"{label}threshold {r['threshold']:.2f} margin {r['margin']:.2f}: hit rate {r['hit_rate']:.1%}  "
+          f"precision {precision}  false hits {r['false_hits']}/{r['out_of_scope']}")
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the chatbot FAQ index")
+    parser.add_argument("--faq", default=FAQ_FILE)
+    parser.add_argument("--tune", default=TUNE_FILE)
+    parser.add_argument("--eval", default=EVAL_FILE)
+    parser.add_argument("--threshold", type=float, default=FAQ_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=FAQ_MARGIN)
+    parser.add_argument("--sweep", action="store_true", help="tune threshold and margin on --tune")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    index = FaqIndex.from_json(args.faq, args.threshold, args.margin)
+    tune, held_out = _load(args.tune), _load(args.eval)
+    print(f"{len(index)} paraphrases / {len(index.intents)} intents / {len(index.vocab)} terms; "
+          f"{len(tune)} tuning and {len(held_out)} held-out questions")
+
+    if args.verbose:
+        for case in held_out:
+            match = index.best(case["question"])
+            got = match.intent if index.answers_with(match, args.threshold, args.margin) else None
+            mark = "ok " if got == case["intent"] else "ERR"
+            best = f"{match.score:.3f}/{match.margin:.3f} {match.intent}" if match is not None else "-"
+            print(f"{mark} {case['question']!r:60} want={case['intent']} best={best}")
+
+    if args.sweep:
+        results, best = sweep(index, tune)
+        for r in results:
+            _report("tune     ", r)
+        _report("best     ", best)
+        _report("held-out ", evaluate(index, held_out, best["threshold"], best["margin"]))
+    _report("tune     ", evaluate(index, tune, args.threshold, args.margin))
+    _report("held-out ", evaluate(index, held_out, args.threshold, args.margin))
+    print(f"lookup: {lookup_micros(index, held_out):.1f} µs per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# faq_index.py
+"""
+Retrieval index over the curated chatbot FAQ (data/faq.json).
+
+Every paraphrase in the corpus is a TF-IDF vector over whole words, word
+pairs and 4-character pieces of words (so "donating" still meets "donate",
+while "scold" shares little with "cold"). A question is answered with the
+intent of its most similar paraphrase when the cosine similarity reaches
+`threshold` and beats every other intent by at least `margin`; otherwise
+lookup() returns None and the caller moves on (to the language model).
+Entries with a null answer are negative examples (greetings, off-topic
+questions): they never answer, but a question closest to them goes to the
+model instead of the nearest real intent. Lookups are a dictionary pass over the question plus one
+small matrix-vector product, so they take microseconds.
+
+eval_faq.py tunes threshold and margin on data/faq_tune.json and reports
+hit rate and precision on the held-out data/faq_eval.json.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FAQ_FILE = os.environ.get('FAQ_FILE', os.path.join(BASE_DIR, "data", "faq.json"))
+# Minimum cosine similarity for an answer, and minimum lead over the runner-up intent
+# (both tuned with eval_faq.py on data/faq_tune.json)
+FAQ_THRESHOLD = float(os.environ.get('FAQ_THRESHOLD', 0.45))
+FAQ_MARGIN = float(os.environ.get('FAQ_MARGIN', 0.04))
+# A question term that no paraphrase contains still lengthens the question, at this
+# fraction of the top idf: off-topic questions sharing a word or two with the corpus
+# stay below the threshold (tuned with eval_faq.py)
+UNKNOWN_TERM_WEIGHT = 0.5
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an the i me my we you your is am are was were be been it its this that to of in on at for
+with and or do does did can could should would will shall so if im please tell about
+""".split())
+CHAR_GRAM = 4
+
+
+def terms(text):
+    """TF-IDF features of a text: words, adjacent word pairs and character 4-grams of words."""
+    words = [w for w in _WORD.findall(str(text).lower()) if w not in STOPWORDS]
+    out = list(words)
+    out += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        if len(padded) <= CHAR_GRAM:
+            continue  # short words are already covered as whole words
+        out += ["#" + padded[i:i + CHAR_GRAM] for i in range(len(padded) - CHAR_GRAM + 1)]
+    return out
+
+
+class FaqMatch:
+    __slots__ = ("intent", "answer", "score", "margin", "question")
+
+    def __init__(self, intent, answer, score, margin, question):
+        self.intent = intent
+        self.answer = answer  # None for a negative example
+        self.score = score
+        self.margin = margin  # score minus the best score of any other intent
+        self.question = question  # the corpus paraphrase that matched
+
+    def __repr__(self):
+        return f"FaqMatch({self.intent!r}, score={self.score:.3f}, margin={self.margin:.3f})"
+
+
+class FaqIndex:
+    """
+    entries    -- [{"intent", "answer", "questions": [...]}, ...]; answer null = negative example
+    threshold  -- minimum cosine similarity for lookup() to answer
+    margin     -- minimum lead of the best intent over the runner-up
+    """
+
+    def __init__(self, entries, threshold=FAQ_THRESHOLD, margin=FAQ_MARGIN):
+        self.threshold = float(threshold)
+        self.margin = float(margin)
+        self.lookups = 0
+        self.hits = 0
+        self.intents = [e["intent"] for e in entries]
+        self.answers = [e["answer"] for e in entries]
+        self.doc_intent = []  # paraphrase row -> index into intents
+        self.doc_text = []
+        for i, entry in enumerate(entries):
+            for q in entry["questions"]:
+                self.doc_intent.append(i)
+                self.doc_text.append(q)
+        self.doc_intent = np.asarray(self.doc_intent, dtype=np.int64)
+
+        doc_terms = [Counter(terms(q)) for q in self.doc_text]
+        df = Counter(t for counts in doc_terms for t in counts)
+        self.vocab = {t: j for j, t in enumerate(sorted(df))}
+        n_docs = len(doc_terms)
+        # smoothed idf, as in sklearn's TfidfVectorizer
+        self.idf = np.array([math.log((1 + n_docs) / (1 + df[t])) + 1.0 for t in sorted(df)])
+        self.unknown_idf = UNKNOWN_TERM_WEIGHT * (math.log(1 + n_docs) + 1.0)
+
+        # rows: L2-normalized sublinear tf-idf of each paraphrase
+        self.matrix = np.zeros((n_docs, len(self.vocab)), dtype=np.float32)
+        for row, counts in enumerate(doc_terms):
+            for t, c in counts.items():
+                self.matrix[row, self.vocab[t]] = (1.0 + math.log(c)) * self.idf[self.vocab[t]]
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.matrix /= np.where(norms > 0, norms, 1.0)
+
+    @classmethod
+    def from_json(cls, path=FAQ_FILE, threshold=FAQ_THRESHOLD, margin=FAQ_MARGIN):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), threshold, margin)
+
+    def __len__(self):
+        return len(self.doc_text)
+
+    def best(self, question):
+        """Closest FaqMatch regardless of threshold and margin (None if no term is known)."""
+        counts = Counter(terms(question))
+        cols, weights, norm_sq = [], [], 0.0
+        for t, c in counts.items():
+            j = self.vocab.get(t)
+            w = (1.0 + math.log(c)) * (self.idf[j] if j is not None else self.unknown_idf)
+            norm_sq += w * w
+            if j is not None:
+                cols.append(j)
+                weights.append(w)
+        if not cols:
+            return None
+        scores = self.matrix[:, cols] @ np.asarray(weights, dtype=np.float32)
+        scores /= math.sqrt(norm_sq)
+        row = int(np.argmax(scores))
+        intent = int(self.doc_intent[row])
+        others = scores[self.doc_intent != intent]
+        runner_up = float(others.max()) if len(others) else 0.0
+        return FaqMatch(self.intents[intent], self.answers[intent], float(scores[row]),
+                        float(scores[row]) - runner_up, self.doc_text[row])
+
+    def answers_with(self, match, threshold=None, margin=None):
+        """Whether `match` (from best()) is confident enough to answer."""
+        threshold = self.threshold if threshold is None else threshold
+        margin = self.margin if margin is None else margin
+        return (match is not None and match.answer is not None
+                and match.score >= threshold and match.margin >= margin)
+
+    def lookup(self, question):
+        """FaqMatch when the question is close enough to one known intent, else None."""
+        match = self.best(question)
+        self.lookups += 1
+        if not self.answers_with(match):
+            return None
+        self.hits += 1
+        return match
+
+    def stats(self):
+        return {
+            "intents": len(self.intents),
+            "paraphrases": len(self.doc_text),
+            "threshold": self.threshold,
+            "margin": self.margin,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+        }
+
+
+def load_faq_index(path=FAQ_FILE, threshold=FAQ_THRESHOLD, margin=FAQ_MARGIN):
+    """FaqIndex from `path`, or None (with a warning) if it cannot be read."""
+    try:
+        return FaqIndex.from_json(path, threshold, margin)
+    except Exception as e:
+        print(f"⚠️ Could not load FAQ index from {path}: {e}")
+        return None
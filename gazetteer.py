@@ -0,0 +1,240 @@
+# gazetteer.py
+"""
+Known locations (towns, plus one fallback point per state) and a precomputed
+distance table between them.
+
+Every donor and request resolves to a location id: its city, else its state,
+else UNKNOWN_LOCATION. Distances are then a lookup in an (n x n) float32 table
+that build_gazetteer.py writes next to the CSV and that is memory-mapped at
+load; without it, each row is computed (vectorized) when a query needs it.
+"""
+import csv
+import math
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_FILE = os.environ.get('GAZETTEER_FILE', os.path.join(BASE_DIR, "data", "gazetteer.csv"))
+DISTANCE_TABLE_FILE = os.environ.get(
+    'GAZETTEER_DISTANCES_FILE', os.path.join(BASE_DIR, "data", "gazetteer_distances.npy")
+)
+
+EARTH_RADIUS_KM = 6371.0
+# half the earth's circumference: every point is within this distance
+MAX_SEARCH_KM = math.pi * EARTH_RADIUS_KM
+
+UNKNOWN_LOCATION = -1
+# distance to/from a location we could not resolve; only reached by a search
+# that has widened to cover everything
+UNKNOWN_DISTANCE_KM = MAX_SEARCH_KM
+# distance table rows computed per block, which bounds the float64 scratch memory
+DISTANCE_BLOCK_ROWS = 1024
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Return distance in km between two lat/lon points (haversine)."""
+    R = EARTH_RADIUS_KM
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * (math.sin(dlambda / 2) ** 2)
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def normalize_name(name):
+    """
+    Lookup key for a place name: accents stripped, case-folded, punctuation
+    dropped and whitespace collapsed ("  Vijayawada. " -> "vijayawada").
+    Anything that is not a string (None, NaN) normalizes to "".
+    """
+    if not isinstance(name, str):
+        return ""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = name.replace("&", " and ")
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name.casefold()).split())
+
+
+class Gazetteer:
+    """
+    Locations with ids 0..n-1 (CSV row order).
+
+    kind is "city" or "state"; a state row is the point used for donors and
+    requests whose city is missing or unknown (the state capital in the shipped file).
+    """
+
+    def __init__(self, names, states, kinds, lat, lon, aliases=None, table_path=None):
+        self.names = list(names)
+        self.states = list(states)
+        self.kinds = list(kinds)
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.aliases = [list(a) for a in aliases] if aliases is not None else [[] for _ in self.names]
+        self.table_path = table_path
+        self._table = None
+        self._table_checked = False
+
+        # first entry wins, so list the more important of two same-named towns first
+        self._by_city_state, self._by_city, self._by_state = {}, {}, {}
+        for loc_id, (kind, state) in enumerate(zip(self.kinds, self.states)):
+            state_key = normalize_name(state)
+            for key in {normalize_name(n) for n in [self.names[loc_id]] + self.aliases[loc_id]}:
+                if kind == "state":
+                    self._by_state.setdefault(key, loc_id)
+                else:
+                    self._by_city_state.setdefault((key, state_key), loc_id)
+                    self._by_city.setdefault(key, loc_id)
+
+    @classmethod
+    def from_csv(cls, path=GAZETTEER_FILE, table_path=DISTANCE_TABLE_FILE):
+        names, states, kinds, lat, lon, aliases = [], [], [], [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                names.append(row["name"])
+                states.append(row["state"])
+                kinds.append(row["kind"])
+                lat.append(float(row["lat"]))
+                lon.append(float(row["lon"]))
+                aliases.append([a for a in (row.get("aliases") or "").split("|") if a])
+        return cls(names, states, kinds, lat, lon, aliases, table_path=table_path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, city, state=None):
+        """Location id for a (city, state) pair: the city, else the state, else UNKNOWN_LOCATION."""
+        city_key, state_key = normalize_name(city), normalize_name(state)
+        if city_key:
+            loc_id = self._by_city_state.get((city_key, state_key))
+            if loc_id is None:
+                loc_id = self._by_city.get(city_key)
+            if loc_id is not None:
+                return loc_id
+        return self._by_state.get(state_key, UNKNOWN_LOCATION) if state_key else UNKNOWN_LOCATION
+
+    def resolve_ids(self, cities, states):
+        """lookup() over two equal-length sequences; returns an int64 array."""
+        seen = {}
+        ids = np.empty(len(cities), dtype=np.int64)
+        for i, pair in enumerate(zip(cities, states)):
+            loc_id = seen.get(pair)
+            if loc_id is None:
+                loc_id = seen[pair] = self.lookup(*pair)
+            ids[i] = loc_id
+        return ids
+
+    def coords(self, loc_id):
+        """(lat, lon) of a location id, or None for UNKNOWN_LOCATION."""
+        if loc_id < 0:
+            return None
+        return float(self.lat[loc_id]), float(self.lon[loc_id])
+
+    def search_names(self, loc_ids):
+        """Names and aliases of the given locations, as stored values may spell them."""
+        return [n for loc_id in loc_ids for n in [self.names[loc_id]] + self.aliases[loc_id]]
+
+    def lookup_keys(self, loc_ids):
+        """
+        (city_keys, state_keys): sorted normalize_name() keys through which
+        lookup() can reach any of loc_ids. A (city, state) pair resolving to
+        one of them has its city key in the first or its state key in the second.
+        """
+        loc_ids = set(loc_ids)
+        city_keys = {key for key, loc_id in self._by_city.items() if loc_id in loc_ids}
+        city_keys.update(key for (key, _), loc_id in self._by_city_state.items() if loc_id in loc_ids)
+        state_keys = {key for key, loc_id in self._by_state.items() if loc_id in loc_ids}
+        return sorted(city_keys), sorted(state_keys)
+
+    # -----------------------
+    # Distance table
+    # -----------------------
+    def distance_table(self):
+        """The memory-mapped (n x n) km table from table_path, or None if it is missing/stale."""
+        if not self._table_checked:
+            self._table = self._load_table()
+            self._table_checked = True
+            if self._table is None and self.table_path:
+                print(f"⚠️ {self.table_path} missing or stale, computing distances per query "
+                      f"(run build_gazetteer.py to precompute them)")
+        return self._table
+
+    def _load_table(self):
+        if not self.table_path or not os.path.exists(self.table_path):
+            return None
+        try:
+            table = np.load(self.table_path, mmap_mode="r")
+        except Exception as e:
+            print(f"⚠️ Could not load distance table {self.table_path}: {e}")
+            return None
+        n = len(self)
+        if table.shape != (n, n):
+            return None
+        # spot-check the first and last rows so an edited CSV is not served stale distances
+        for loc_id in {0, n - 1} if n else ():
+            if not np.allclose(table[loc_id], self._distance_rows([loc_id])[0], rtol=0, atol=0.01):
+                return None
+        return table
+
+    def _distance_rows(self, loc_ids):
+        """km from each of loc_ids to every location, as float32 rows."""
+        loc_ids = np.asarray(loc_ids, dtype=np.int64)
+        return haversine_matrix(self.lat[loc_ids], self.lon[loc_ids], self.lat, self.lon)
+
+    def _row(self, loc_id):
+        table = self.distance_table()
+        return table[loc_id] if table is not None else self._distance_rows([loc_id])[0]
+
+    def distances(self, loc_id, to_ids):
+        """km from loc_id to every id in to_ids; unknown locations on either side get UNKNOWN_DISTANCE_KM."""
+        to_ids = np.asarray(to_ids, dtype=np.int64)
+        if loc_id < 0:
+            return np.full(len(to_ids), UNKNOWN_DISTANCE_KM)
+        # the extra last entry is what UNKNOWN_LOCATION (-1) indexes
+        return np.append(self._row(loc_id), UNKNOWN_DISTANCE_KM)[to_ids]
+
+    def ids_within(self, loc_id, radius_km):
+        """Location ids within radius_km of loc_id (none for UNKNOWN_LOCATION)."""
+        if loc_id < 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self._row(loc_id) <= radius_km)
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """haversine_km() from every (lat1, lon1) point (rows) to every (lat2, lon2) point (columns), float32."""
+    phi1 = np.radians(np.asarray(lat1, dtype=float))[:, None]
+    phi2 = np.radians(np.asarray(lat2, dtype=float))[None, :]
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2, dtype=float))[None, :] - np.radians(np.asarray(lon1, dtype=float))[:, None]
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return (EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))).astype(np.float32)
+
+
+def build_distance_table(gazetteer, out=None):
+    """Pairwise haversine distances; row i holds distances from location i. Fills `out` if given."""
+    n = len(gazetteer)
+    table = np.empty((n, n), dtype=np.float32) if out is None else out
+    for start in range(0, n, DISTANCE_BLOCK_ROWS):
+        rows = np.arange(start, min(start + DISTANCE_BLOCK_ROWS, n))
+        table[start:start + len(rows)] = gazetteer._distance_rows(rows)
+    return table
+
+
+def save_distance_table(gazetteer, path=DISTANCE_TABLE_FILE):
+    """Write the table to `path` block by block, so it never has to fit in memory."""
+    n = len(gazetteer)
+    table = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, n))
+    build_distance_table(gazetteer, out=table)
+    table.flush()
+    return table
+
+
+def load_gazetteer(path=GAZETTEER_FILE, table_path=DISTANCE_TABLE_FILE):
+    """The gazetteer from `path`, or an empty one (everything unknown) if the file cannot be read."""
+    try:
+        return Gazetteer.from_csv(path, table_path)
+    except Exception as e:
+        print(f"⚠️ Could not load gazetteer {path}: {e}")
+        return Gazetteer([], [], [], [], [])
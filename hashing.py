@@ -0,0 +1,117 @@
+# hashing.py
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately CPU-heavy. Running it inline lets a login burst occupy
+every web worker; here it runs on a small fixed pool (bcrypt releases the GIL
+while hashing), and callers beyond the queue limit get HasherBusy right away.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """The hashing queue is full (or a hash took longer than the caller's timeout)."""
+
+
+class PasswordHasher:
+    """
+    workers    -- threads running bcrypt
+    max_queue  -- hashes allowed to wait for a free worker; more raise HasherBusy
+    rounds     -- bcrypt cost factor for new hashes (each +1 doubles the work);
+                  existing hashes keep the cost they were created with
+    timeout    -- seconds a caller waits for its result before HasherBusy
+    """
+
+    def __init__(self, workers=2, max_queue=32, rounds=12, timeout=10.0):
+        self.workers = int(workers)
+        self.max_queue = int(max_queue)
+        self.rounds = int(rounds)
+        self.timeout = float(timeout)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+
+        # counters for stats()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def hash(self, password):
+        """bcrypt hash (str) of a str password."""
+        return self._wait(self.submit_hash(password))
+
+    def check(self, password, hashed):
+        """True if the str password matches the stored bcrypt hash."""
+        return self._wait(self.submit_check(password, hashed))
+
+    def submit_hash(self, password):
+        """Queue hash() and return its concurrent.futures.Future (for asyncio.wrap_future)."""
+        return self._submit(lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8"))
+
+    def submit_check(self, password, hashed):
+        """Queue check() and return its Future."""
+        return self._submit(lambda: bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8")))
+
+    def busy(self, message):
+        """Count a caller giving up on its result after `timeout` and build the HasherBusy to raise."""
+        with self._lock:
+            self.timed_out += 1
+        return HasherBusy(message)
+
+    def stats(self):
+        with self._lock:
+            running = min(self._pending, self.workers)
+            done = self.completed
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "running": running,
+                "queued": self._pending - running,
+                "max_queue": self.max_queue,
+                "completed": done,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_hash_ms": round(1000 * self.hash_seconds / done, 3) if done else 0.0,
+                "max_hash_ms": round(1000 * self.max_hash_seconds, 3),
+                "avg_wait_ms": round(1000 * self.wait_seconds / done, 3) if done else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+            }
+
+    def _submit(self, fn):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy("password hashing queue is full")
+            self._pending += 1
+
+        submitted = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            try:
+                return fn()
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self._pending -= 1
+                    self.completed += 1
+                    self.hash_seconds += finished - started
+                    self.max_hash_seconds = max(self.max_hash_seconds, finished - started)
+                    self.wait_seconds += started - submitted
+                    self.max_wait_seconds = max(self.max_wait_seconds, started - submitted)
+
+        return self._executor.submit(job)
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise self.busy(f"password hashing took longer than {self.timeout:.1f}s")
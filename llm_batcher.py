@@ -0,0 +1,211 @@
+# llm_batcher.py
+"""
+Prompt scheduler inside the chatbot worker process (llm_worker.serve).
+
+Prompts wait in one FIFO per user and are taken round-robin across users, so
+one user sending many messages cannot hold everyone else back. Each model
+call takes up to `max_batch` prompts:
+
+- a backend with generate_batch(prompts, max_tokens) gets them in one call;
+  the first prompt waits up to `max_wait` seconds for others to join
+- other backends (GPT4All) generate one prompt at a time, so they get
+  batches of one and nothing waits
+
+Either way, queued prompts identical to one being generated (same text and
+max_tokens, not streamed) are answered by that same generation. Streamed
+prompts always run on their own, token by token, and can be cancelled
+mid-generation.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class MicroBatcher:
+    """
+    model      -- generate(prompt, max_tokens, streaming=True), optionally generate_batch()
+    emit       -- callable(reply dict) sending a reply (or a streamed token) to the web process
+    max_batch  -- prompts per batched model call
+    max_wait   -- seconds the first prompt of a batch waits for more to arrive
+    """
+
+    def __init__(self, model, emit, max_batch=4, max_wait=0.01):
+        self.model = model
+        self.emit = emit
+        self.can_batch = hasattr(model, "generate_batch")
+        self.max_batch = max(1, int(max_batch)) if self.can_batch else 1
+        self.max_wait = float(max_wait)
+
+        self._queues = OrderedDict()  # user -> deque of jobs; order = whose turn is next
+        self._queued = 0
+        self._running = set()
+        self._cancelled = set()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def submit(self, job):
+        with self._cond:
+            self._queues.setdefault(job.get("user") or "", deque()).append(job)
+            self._queued += 1
+            self._cond.notify()
+
+    def cancel(self, job_id):
+        """Drop a queued prompt right away, or stop a running one at its next token."""
+        with self._cond:
+            if job_id in self._running:
+                self._cancelled.add(job_id)
+                return
+            job = self._remove_queued(job_id)
+        if job is not None:
+            self.emit({"id": job_id, "ok": False, "skipped": True, "error": "cancelled before generation started"})
+
+    def close(self):
+        """Finish what is queued, then make run() return."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._run_batch(batch)
+            finally:
+                ids = [job["id"] for job in batch]
+                with self._cond:
+                    self._running.difference_update(ids)
+                    self._cancelled.difference_update(ids)
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _next_batch(self):
+        with self._cond:
+            while not self._queued and not self._closed:
+                self._cond.wait()
+            if not self._queued:
+                return None
+            if self.max_batch > 1 and self.max_wait > 0:
+                deadline = time.monotonic() + self.max_wait
+                while self._queued < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            batch = []
+            while self._queued and len(batch) < self.max_batch:
+                user, jobs = next(iter(self._queues.items()))
+                batch.append(jobs.popleft())
+                self._queued -= 1
+                del self._queues[user]
+                if jobs:
+                    self._queues[user] = jobs  # back of the line: round robin
+            batch += self._take_duplicates(batch)
+            self._running.update(job["id"] for job in batch)
+            return batch
+
+    def _take_duplicates(self, batch):
+        # caller holds self._cond
+        keys = {_key(job) for job in batch if not job.get("stream")}
+        if not keys:
+            return []
+        found = []
+        for user in list(self._queues):
+            jobs = self._queues[user]
+            same = [job for job in jobs if not job.get("stream") and _key(job) in keys]
+            if same:
+                for job in same:
+                    jobs.remove(job)
+                self._queued -= len(same)
+                found += same
+                if not jobs:
+                    del self._queues[user]
+        return found
+
+    def _remove_queued(self, job_id):
+        # caller holds self._cond
+        for user, jobs in self._queues.items():
+            for job in jobs:
+                if job["id"] == job_id:
+                    jobs.remove(job)
+                    self._queued -= 1
+                    if not jobs:
+                        del self._queues[user]
+                    return job
+        return None
+
+    def _is_cancelled(self, job_id):
+        with self._cond:
+            return job_id in self._cancelled
+
+    def _run_batch(self, batch):
+        now = time.time()
+        groups = OrderedDict()  # (prompt, max_tokens) -> jobs sharing one generation
+        streams = []
+        for job in batch:
+            if self._is_cancelled(job["id"]) or now > job.get("deadline", float("inf")):
+                self.emit({"id": job["id"], "ok": False, "skipped": True,
+                           "error": "caller gave up before generation started"})
+            elif job.get("stream"):
+                streams.append(job)
+            else:
+                groups.setdefault(_key(job), []).append(job)
+
+        if self.can_batch and len(groups) > 1:
+            self._generate_batched(groups)
+        else:
+            for jobs in groups.values():
+                self._generate_one(jobs)
+        for job in streams:
+            self._generate_one([job], stream=True)
+
+    def _generate_batched(self, groups):
+        by_tokens = OrderedDict()
+        for key in groups:
+            by_tokens.setdefault(key[1], []).append(key)
+        for max_tokens, keys in by_tokens.items():
+            started = time.monotonic()
+            try:
+                texts = self.model.generate_batch([prompt for prompt, _ in keys], max_tokens=max_tokens)
+            except Exception as e:
+                for key in keys:
+                    for job in groups[key]:
+                        self.emit({"id": job["id"], "ok": False, "error": f"{type(e).__name__}: {e}"})
+                continue
+            seconds = time.monotonic() - started
+            for key, text in zip(keys, texts):
+                jobs = groups[key]
+                for job in jobs:
+                    self.emit({"id": job["id"], "ok": True, "text": text, "seconds": seconds,
+                               "batch": len(keys), "shared": len(jobs) > 1})
+
+    def _generate_one(self, jobs, stream=False):
+        ids = [job["id"] for job in jobs]
+        job = jobs[0]
+        started = time.monotonic()
+        tokens = []
+        try:
+            for token in self.model.generate(job["prompt"], max_tokens=job.get("max_tokens", 200), streaming=True):
+                tokens.append(token)
+                if stream:
+                    self.emit({"id": job["id"], "token": token})
+                # a shared generation stops only once every caller has given up
+                if all(self._is_cancelled(i) for i in ids):
+                    for i in ids:
+                        self.emit({"id": i, "ok": False, "cancelled": True, "error": "cancelled by caller"})
+                    return
+        except Exception as e:
+            for i in ids:
+                self.emit({"id": i, "ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+        seconds = time.monotonic() - started
+        for i in ids:
+            self.emit({"id": i, "ok": True, "text": "".join(tokens), "seconds": seconds,
+                       "batch": 1, "shared": len(ids) > 1})
+
+
+def _key(job):
+    return job["prompt"], job.get("max_tokens", 200)
@@ -0,0 +1,64 @@
+# llm_stub.py
+"""
+Stand-in for the GPT4All model, for load tests without the weights
+(bench_llm.py, or LLM_MODEL=stub).
+
+Generation costs one "decoding step" per token. A batch of prompts shares
+its steps: each step costs `step_ms` plus `seq_ms` for every extra sequence,
+which is roughly how batched decoding on a real backend amortises the cost
+of reading the weights. Replies are deterministic in the prompt.
+
+    StubModel.from_spec("stub:step_ms=20,seq_ms=2,tokens=40")
+"""
+import hashlib
+import time
+
+WORDS = ("blood", "donor", "please", "check", "with", "your", "local", "centre", "thank", "you",
+         "for", "helping", "save", "lives", "today")
+
+
+class StubModel:
+    """
+    step_ms  -- milliseconds per decoding step
+    seq_ms   -- extra milliseconds per step for each sequence beyond the first in a batch
+    tokens   -- reply length, capped by max_tokens
+    """
+
+    def __init__(self, step_ms=20.0, seq_ms=2.0, tokens=40):
+        self.step_ms = float(step_ms)
+        self.seq_ms = float(seq_ms)
+        self.tokens = int(tokens)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """"stub" or "stub:key=value,..." with the constructor's arguments."""
+        _, _, params = spec.partition(":")
+        kwargs = {}
+        for part in filter(None, params.split(",")):
+            key, _, value = part.partition("=")
+            kwargs[key.strip()] = float(value)
+        return cls(**kwargs)
+
+    def reply_tokens(self, prompt, max_tokens):
+        seed = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest(), 16)
+        n = min(self.tokens, int(max_tokens))
+        return [WORDS[(seed >> (i % 128)) % len(WORDS)] + " " for i in range(n)]
+
+    def generate(self, prompt, max_tokens=200, streaming=False):
+        tokens = self.reply_tokens(prompt, max_tokens)
+        if not streaming:
+            time.sleep(len(tokens) * self.step_ms / 1000)
+            return "".join(tokens)
+        return self._stream(tokens)
+
+    def _stream(self, tokens):
+        for token in tokens:
+            time.sleep(self.step_ms / 1000)
+            yield token
+
+    def generate_batch(self, prompts, max_tokens=200):
+        """Replies to all `prompts`, decoded together."""
+        replies = [self.reply_tokens(p, max_tokens) for p in prompts]
+        steps = max((len(r) for r in replies), default=0)
+        time.sleep(steps * (self.step_ms + self.seq_ms * (len(prompts) - 1)) / 1000)
+        return ["".join(r) for r in replies]
@@ -0,0 +1,319 @@
+# llm_worker.py
+"""
+The chatbot's language model, in its own long-lived process.
+
+The web process never loads GPT4All. LLMWorker starts `python llm_worker.py`
+on first use; that process loads the model once and answers prompts over a
+pipe (one JSON object per line each way), scheduled by llm_batcher.MicroBatcher:
+round-robin across users, batched when the model supports it. Callers block on
+their own reply with a timeout, at most `max_queue` prompts may be outstanding,
+and a prompt whose caller already gave up is skipped rather than generated, or
+stopped mid-generation. stream() yields tokens as the model produces them.
+If the worker dies, outstanding callers get LLMError and the next call starts
+a fresh one.
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from llm_batcher import MicroBatcher
+
+
+class LLMError(Exception):
+    """The worker failed the prompt, or exited while it was outstanding."""
+
+
+class LLMBusy(LLMError):
+    """Too many prompts outstanding (or the reply took longer than the caller's timeout)."""
+
+
+class LLMWorker:
+    """
+    model       -- GPT4All model file or name, passed to GPT4All() in the worker
+    max_queue   -- prompts allowed outstanding (queued + generating); more raise LLMBusy
+    timeout     -- seconds a caller waits for its reply before LLMBusy; includes the
+                   model load when the call starts the worker
+    max_tokens  -- default generation length
+    max_batch   -- prompts per model call, for models that batch (see llm_batcher)
+    max_wait    -- seconds a prompt waits for others to fill its batch
+
+    model "stub" or "stub:step_ms=20,seq_ms=2,tokens=40" runs llm_stub.StubModel
+    instead of GPT4All, for load tests without the weights.
+    """
+
+    def __init__(self, model, max_queue=16, timeout=60.0, max_tokens=200, max_batch=4, max_wait=0.01):
+        self.model = model
+        self.max_queue = int(max_queue)
+        self.timeout = float(timeout)
+        self.max_tokens = int(max_tokens)
+        self.max_batch = int(max_batch)
+        self.max_wait = float(max_wait)
+
+        self._proc = None
+        self._lock = threading.Lock()  # process lifecycle + pending table + pipe writes
+        self._pending = {}  # id -> queue.Queue of replies (tokens, then the final reply)
+        self._ids = itertools.count(1)
+
+        # counters for stats()
+        self.started_at = None
+        self.starts = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.streams = 0
+        self.batched = 0
+        self.shared = 0
+        self.first_token_seconds = 0.0
+        self.max_first_token_seconds = 0.0
+        self.generate_seconds = 0.0
+        self.max_generate_seconds = 0.0
+
+    def generate(self, prompt, max_tokens=None, timeout=None, user=None):
+        """Reply text for `prompt`. `user` keys fair ordering. Raises LLMBusy or LLMError."""
+        timeout = self.timeout if timeout is None else float(timeout)
+        job_id, replies = self._submit(prompt, max_tokens, timeout, stream=False, user=user)
+        try:
+            reply = self._next_reply(replies, timeout)
+        finally:
+            self._abandon(job_id)
+        if not reply.get("ok"):
+            raise LLMError(reply.get("error") or "chatbot worker failed")
+        return reply["text"]
+
+    def stream(self, prompt, max_tokens=None, timeout=None, user=None):
+        """
+        Yield the reply to `prompt` token by token. `timeout` bounds the wait for
+        each token (the first one included), not the whole reply. Closing the
+        generator early stops the generation in the worker.
+        """
+        timeout = self.timeout if timeout is None else float(timeout)
+        submitted = time.monotonic()
+        job_id, replies = self._submit(prompt, max_tokens, timeout, stream=True, user=user)
+        first = True
+        try:
+            while True:
+                reply = self._next_reply(replies, timeout)
+                if "token" in reply:
+                    if first:
+                        self._record_first_token(time.monotonic() - submitted)
+                        first = False
+                    yield reply["token"]
+                    continue
+                if not reply.get("ok"):
+                    raise LLMError(reply.get("error") or "chatbot worker failed")
+                return
+        finally:
+            self._abandon(job_id)
+
+    def start(self):
+        """Start the worker now instead of on the first prompt (e.g. to load the model at boot)."""
+        with self._lock:
+            self._ensure_started()
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()  # EOF: the worker exits once the prompts it holds are done
+            proc.wait(timeout)
+        except Exception:
+            proc.kill()
+
+    def stats(self):
+        with self._lock:
+            done = self.completed
+            return {
+                "model": self.model,
+                "running": self._proc is not None and self._proc.poll() is None,
+                "pid": self._proc.pid if self._proc is not None else None,
+                "starts": self.starts,
+                "outstanding": len(self._pending),
+                "max_queue": self.max_queue,
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+                "completed": done,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "skipped": self.skipped,
+                "cancelled": self.cancelled,
+                "streams": self.streams,
+                "batched": self.batched,
+                "shared": self.shared,
+                "avg_first_token_ms": round(1000 * self.first_token_seconds / self.streams, 3) if self.streams else 0.0,
+                "max_first_token_ms": round(1000 * self.max_first_token_seconds, 3),
+                "avg_generate_ms": round(1000 * self.generate_seconds / done, 3) if done else 0.0,
+                "max_generate_ms": round(1000 * self.max_generate_seconds, 3),
+            }
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _submit(self, prompt, max_tokens, timeout, stream, user=None):
+        replies = queue.Queue()
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise LLMBusy("chatbot queue is full")
+            self._ensure_started()
+            job_id = next(self._ids)
+            self._pending[job_id] = replies
+            try:
+                self._send({"id": job_id, "prompt": prompt, "stream": stream, "user": user,
+                            "max_tokens": int(max_tokens or self.max_tokens),
+                            "deadline": time.time() + timeout})
+            except (OSError, ValueError) as e:
+                del self._pending[job_id]
+                raise LLMError(f"chatbot worker is not accepting prompts: {e}")
+        return job_id, replies
+
+    def _next_reply(self, replies, timeout):
+        try:
+            return replies.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timed_out += 1
+            raise LLMBusy(f"chatbot reply took longer than {timeout:.1f}s")
+
+    def _abandon(self, job_id):
+        """Forget a prompt; if the worker still owes a reply, tell it to stop."""
+        with self._lock:
+            if self._pending.pop(job_id, None) is None or self._proc is None:
+                return
+            try:
+                self._send({"cancel": job_id})
+            except (OSError, ValueError):
+                pass
+
+    def _send(self, message):
+        # caller holds self._lock
+        self._proc.stdin.write(json.dumps(message) + "\n")
+        self._proc.stdin.flush()
+
+    def _record_first_token(self, seconds):
+        with self._lock:
+            self.streams += 1
+            self.first_token_seconds += seconds
+            self.max_first_token_seconds = max(self.max_first_token_seconds, seconds)
+
+    def _ensure_started(self):
+        # caller holds self._lock
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.model,
+             "--max-batch", str(self.max_batch), "--max-wait-ms", str(1000 * self.max_wait)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1,
+        )
+        self._proc = proc
+        self.starts += 1
+        self.started_at = time.time()
+        threading.Thread(target=self._read_replies, args=(proc,), name="llm-worker-reader", daemon=True).start()
+
+    def _read_replies(self, proc):
+        for line in proc.stdout:
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                if "token" in reply:
+                    replies = self._pending.get(reply.get("id"))
+                else:
+                    replies = self._pending.pop(reply.get("id"), None)
+                    if reply.get("skipped"):
+                        self.skipped += 1
+                    elif reply.get("cancelled"):
+                        self.cancelled += 1
+                    elif reply.get("ok"):
+                        self.completed += 1
+                        seconds = float(reply.get("seconds", 0.0))
+                        self.generate_seconds += seconds
+                        self.max_generate_seconds = max(self.max_generate_seconds, seconds)
+                        if reply.get("batch", 1) > 1:
+                            self.batched += 1
+                        if reply.get("shared"):
+                            self.shared += 1
+                    else:
+                        self.failed += 1
+            if replies is not None:
+                replies.put(reply)
+
+        # EOF: the worker exited; fail whatever it still owed and start over on the next call
+        proc.wait()
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+            orphans, self._pending = self._pending, {}
+            self.failed += len(orphans)
+        if orphans:
+            print(f"⚠️ Chatbot worker exited (code {proc.returncode}) with {len(orphans)} prompts outstanding")
+        for replies in orphans.values():
+            replies.put({"ok": False, "error": f"chatbot worker exited (code {proc.returncode})"})
+
+
+# -----------------------
+# Worker process
+# -----------------------
+def load_model(model_name):
+    if model_name == "stub" or model_name.startswith("stub:"):
+        from llm_stub import StubModel
+        return StubModel.from_spec(model_name)
+    from gpt4all import GPT4All
+    # a local file only: GPT4All would otherwise download a multi-GB model on the first chat
+    path = os.path.abspath(model_name)
+    return GPT4All(os.path.basename(path), model_path=os.path.dirname(path), allow_download=False)
+
+
+def serve(model_name, max_batch=4, max_wait=0.01):
+    """Load the model, then answer prompts from stdin until it closes."""
+    # the protocol owns the real stdout; anything the model library prints goes to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    out_lock = threading.Lock()  # replies come from the scheduler and, for cancels, the stdin thread
+
+    def emit(reply):
+        line = json.dumps(reply) + "\n"
+        with out_lock:
+            out.write(line)
+
+    model = load_model(model_name)
+    batcher = MicroBatcher(model, emit, max_batch=max_batch, max_wait=max_wait)
+    print(f"✅ Chatbot model loaded: {model_name} (max batch {batcher.max_batch})", file=sys.stderr)
+
+    # stdin is read on its own thread so prompts queue up (and cancels arrive) mid-generation
+    def read_stdin():
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if "cancel" in message:
+                batcher.cancel(message["cancel"])
+            else:
+                batcher.submit(message)
+        batcher.close()
+
+    threading.Thread(target=read_stdin, name="llm-stdin", daemon=True).start()
+    batcher.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chatbot model worker (started by LLMWorker)")
+    parser.add_argument("model")
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    serve(args.model, args.max_batch, args.max_wait_ms / 1000)
@@ -0,0 +1,109 @@
+# match_jobs.py
+"""
+Background match jobs.
+
+Request creation enqueues a job here instead of making the client call
+/match/<id> afterwards. A small pool of worker threads runs jobs by urgency
+(Critical first), FIFO within the same urgency.
+"""
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class MatchJobQueue:
+    """
+    Bounded priority queue of match jobs with a fixed pool of worker threads.
+
+    run_job(request_id, **params) must return (body, http_status); it runs on a
+    worker thread. Finished job records are kept (up to `max_records`) so
+    clients can poll status(job_id).
+    """
+
+    def __init__(self, run_job, workers=2, max_queue=100, max_records=1000):
+        self._run_job = run_job
+        self.workers = int(workers)
+        self.max_queue = int(max_queue)
+        self.max_records = int(max_records)
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, request_id, priority=0, **params):
+        """
+        Enqueue a job; higher `priority` runs first. Returns the job id, or None
+        when the queue is full.
+        """
+        with self._lock:
+            if self._queue.qsize() >= self.max_queue:
+                return None
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "request_id": request_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._evict_locked()
+            self._queue.put((-priority, next(self._seq), job_id, request_id, params))
+        return job_id
+
+    def status(self, job_id):
+        """A copy of the job record, or None if unknown (or evicted)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"queued": self._queue.qsize(), "workers": self.workers, "jobs": counts}
+
+    def _ensure_started(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"match-job-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _evict_locked(self):
+        # drop the oldest finished records first; never drop queued/running jobs
+        if len(self._jobs) <= self.max_records:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_records:
+                break
+            if self._jobs[job_id]["status"] in ("done", "failed"):
+                del self._jobs[job_id]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _worker(self):
+        while True:
+            _, _, job_id, request_id, params = self._queue.get()
+            self._update(job_id, status="running", started_at=time.time())
+            try:
+                body, status = self._run_job(request_id, **params)
+                if status == 200:
+                    self._update(job_id, status="done", result=body, finished_at=time.time())
+                else:
+                    self._update(job_id, status="failed", error=body.get("error"), finished_at=time.time())
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+                print(f"⚠️ Match job {job_id} for request {request_id} failed: {e}")
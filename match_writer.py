@@ -0,0 +1,173 @@
+# match_writer.py
+"""
+Persistence of match results.
+
+All rows go out as one multi-row upsert in one transaction, relying on the
+UNIQUE (request_id, donor_id) key on `matches` (see schema.sql) so repeated or
+concurrent matches of the same request never create duplicates. Databases
+loaded from rakth_sathi.sql lack that key; migrate_matches.sql adds it, and
+the app warns at startup while it is missing (has_match_key).
+
+The upsert uses the row-alias form (MySQL 8.0.19+): VALUES() in ON DUPLICATE
+KEY UPDATE is deprecated from 8.0.20 and its warning 1287 becomes an
+exception under raise_on_warnings.
+"""
+import queue
+import threading
+
+UPSERT_CHUNK = 500
+
+
+def match_rows(request_id, final_list):
+    """(request_id, donor_id, match_score) tuples for a ranked donor list."""
+    return [(int(request_id), int(d["donor_id"]), float(d["score"])) for d in final_list]
+
+
+def upsert_statements(rows):
+    """(sql, params) multi-row upserts covering `rows`, UPSERT_CHUNK rows per statement."""
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        chunk = rows[start:start + UPSERT_CHUNK]
+        values = ", ".join(["(%s, %s, %s)"] * len(chunk))
+        params = [v for row in chunk for v in row]
+        yield ("INSERT INTO matches (request_id, donor_id, match_score) VALUES " + values +
+               " AS new ON DUPLICATE KEY UPDATE match_score = new.match_score", params)
+
+
+HAS_MATCH_KEY_SQL = """
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'matches'
+      AND index_name = 'uq_matches_request_donor' AND non_unique = 0
+"""
+
+
+def has_match_key(conn):
+    """Whether `matches` has the UNIQUE (request_id, donor_id) key the upsert needs."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(HAS_MATCH_KEY_SQL)
+        return cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+
+
+def save_match_rows(conn, rows):
+    """Upsert (request_id, donor_id, match_score) rows in a single transaction."""
+    if not rows:
+        return 0
+    cursor = conn.cursor()
+    try:
+        for sql, params in upsert_statements(rows):
+            cursor.execute(sql, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+class MatchWriter:
+    """
+    Background writer for match results.
+
+    submit() only enqueues; a daemon thread drains the queue and writes
+    everything it picked up with one save_match_rows call. When the queue is
+    full, submit() returns False and the caller should write synchronously.
+    """
+
+    def __init__(self, connect, max_queue=1000, max_rows_per_flush=5000):
+        self._connect = connect
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.max_rows_per_flush = max_rows_per_flush
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # counters for stats()
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def submit(self, rows):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(rows)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self, timeout=None):
+        """
+        Block until everything submitted so far has been written (or failed).
+        Returns False if that took longer than `timeout`; the rows still queued
+        are then logged, since at shutdown (atexit) they are lost.
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            pass  # the writer is stuck on a slow upsert and the queue is full
+        else:
+            if done.wait(timeout):
+                return True
+        self._log_unwritten()
+        return False
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    def _log_unwritten(self):
+        with self._queue.mutex:
+            batches = [item for item in self._queue.queue if not isinstance(item, threading.Event)]
+        rows = [row for batch in batches for row in batch]
+        request_ids = sorted({row[0] for row in rows})
+        print(f"⚠️ Match writer did not finish: {len(rows)} queued matches not written "
+              f"(request_ids {request_ids}), plus any in the upsert still running")
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="match-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            # coalesce whatever else is already waiting into the same transaction
+            n_rows = 0 if isinstance(items[0], threading.Event) else len(items[0])
+            while n_rows < self.max_rows_per_flush:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                if not isinstance(item, threading.Event):
+                    n_rows += len(item)
+
+            rows = [row for item in items if not isinstance(item, threading.Event) for row in item]
+            if rows:
+                self._write(rows)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, rows):
+        try:
+            conn = self._connect()
+            try:
+                save_match_rows(conn, rows)
+            finally:
+                conn.close()
+            self.written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            self.failed += len(rows)
+            print(f"⚠️ Background match writer could not save {len(rows)} matches: {e}")
@@ -0,0 +1,184 @@
+# matching.py
+"""
+Columnar donor matching.
+
+Everything here works on whole donor columns at once instead of walking the
+donor table row by row, so match latency stays flat as the table grows.
+"""
+import numpy as np
+
+from blood_groups import BLOOD_GROUPS, blood_compatible
+from gazetteer import UNKNOWN_DISTANCE_KM, load_gazetteer
+
+# Every donor/request location resolves through this (see gazetteer.py)
+GAZETTEER = load_gazetteer()
+
+# Column order expected by models/tree_matcher.joblib and models/logreg_matcher.joblib
+FEATURE_COLUMNS = [
+    "blood_match", "dist", "urg_score",
+    "days_since", "availability",
+    "number_of_donation", "pints_donated",
+]
+
+AVAILABLE_VALUES = ("yes", "y", "true")
+
+# -----------------------
+# Scalar utils
+# -----------------------
+def urgency_score(urg):
+    return {'Low': 1, 'Medium': 2, 'High': 3, 'Critical': 4}.get(urg, 2)
+
+def resolve_location(city, state):
+    """GAZETTEER location id for one location: city first, then state, else UNKNOWN_LOCATION."""
+    return GAZETTEER.lookup(city, state)
+
+# -----------------------
+# Columnar helpers
+# -----------------------
+def donor_column(donors, name, default):
+    """Return donors[name], or a column filled with `default` if it is missing."""
+    if name in donors.columns:
+        return donors[name]
+    import pandas as pd  # imported on first use: it is the slowest part of app startup
+    return pd.Series([default] * len(donors), index=donors.index, dtype=object)
+
+def _numeric_column(donors, name):
+    import pandas as pd
+    # NULLs and unparsable values count as 0, like the old per-row int()/float() fallbacks
+    return pd.to_numeric(donor_column(donors, name, 0), errors="coerce").fillna(0).to_numpy(dtype=float)
+
+def donor_locations(donors):
+    """Resolve every donor's city/state to a GAZETTEER location id (int64 array)."""
+    return GAZETTEER.resolve_ids(
+        donor_column(donors, "city", None).tolist(),
+        donor_column(donors, "state", None).tolist(),
+    )
+
+# blood group -> small int code, and recipient x donor compatibility as a matrix
+_BG_CODES = {bg: i for i, bg in enumerate(BLOOD_GROUPS)}
+_COMPAT = np.array([[blood_compatible(d, r) for d in BLOOD_GROUPS] for r in BLOOD_GROUPS], dtype=np.int64)
+
+def _bg_codes(values):
+    """Blood group codes (index into BLOOD_GROUPS), -1 for missing/unknown."""
+    import pandas as pd
+    return pd.Series(values, dtype=object).map(_BG_CODES).fillna(-1).to_numpy(dtype=np.int64)
+
+class DonorFeatures:
+    """
+    Per-donor feature columns that do not depend on the request, computed once
+    per donor snapshot (build it through DonorView.index(DonorFeatures)).
+
+    matrix() then only gathers rows and fills in the request-dependent columns.
+    """
+
+    def __init__(self, donors):
+        self.blood_group_code = _bg_codes(donor_column(donors, "blood_group", None).to_numpy(dtype=object))
+
+        days_since = np.trunc(_numeric_column(donors, "months_since_first_donation") * 30)
+        availability = donor_column(donors, "availability", "").astype(str).str.strip().str.lower() \
+            .isin(AVAILABLE_VALUES).to_numpy(dtype=np.int64)
+        number_of_donation = np.trunc(_numeric_column(donors, "number_of_donation"))
+        pints_donated = np.trunc(_numeric_column(donors, "pints_donated"))
+        # FEATURE_COLUMNS[3:]
+        self.static = np.column_stack([days_since, availability, number_of_donation, pints_donated]).astype(float)
+
+    def blood_match(self, rows, req_bg):
+        """1 where the donor can give to req_bg (a group, or one group per row)."""
+        donor_codes = self.blood_group_code[rows]
+        if np.ndim(req_bg) == 0:
+            req_code = _BG_CODES.get(req_bg, -1)
+            if req_code < 0:
+                return np.zeros(len(rows), dtype=np.int64)
+            # the last column of the padded row handles unknown donor groups (code -1)
+            return np.append(_COMPAT[req_code], 0)[donor_codes]
+        req_codes = _bg_codes(req_bg)
+        known = (donor_codes >= 0) & (req_codes >= 0)
+        match = np.zeros(len(rows), dtype=np.int64)
+        match[known] = _COMPAT[req_codes[known], donor_codes[known]]
+        return match
+
+    def matrix(self, rows, req_bg, dist, urg_score):
+        """
+        The 7-column feature matrix (see FEATURE_COLUMNS) for donors at `rows`.
+
+        `req_bg` and `urg_score` may be scalars or per-row arrays (batch matching).
+        Returns (X, blood_match).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        blood_match = self.blood_match(rows, req_bg)
+        X = np.empty((len(rows), len(FEATURE_COLUMNS)), dtype=float)
+        X[:, 0] = blood_match
+        X[:, 1] = dist
+        X[:, 2] = urg_score
+        X[:, 3:] = self.static[rows]
+        return X, blood_match
+
+# -----------------------
+# Scoring & ranking
+# -----------------------
+def score_candidates(X, scorer):
+    """scorer.score(X) (see scorer.py), or a simple heuristic when no models are loaded."""
+    if scorer is not None:
+        return scorer.score(X)
+
+    # Simple heuristic if models missing: prefer blood_match, availability, closeness, donation history
+    dist = X[:, 1]
+    return (X[:, 0] * 2.0) + (X[:, 4] * 1.0) + np.maximum(0, (100 - dist) / 100) + (X[:, 5] * 0.1)
+
+def _top_by_score(positions, scores, k):
+    """The k best `positions` by score (desc), ties broken by position (asc)."""
+    if len(positions) > k:
+        s = scores[positions]
+        kth = np.partition(s, len(s) - k)[len(s) - k]
+        above = positions[s > kth]
+        # fill the rest with the earliest rows tied at the threshold
+        tied = positions[s == kth][:k - len(above)]
+        positions = np.concatenate([above, tied])
+    order = np.lexsort((positions, -scores[positions]))
+    return positions[order]
+
+def top_k_indices(blood_match, scores, k):
+    """
+    Row positions of the top k candidates ordered by (blood_match, score) descending,
+    ties broken by row order. Uses partial selection, so it is O(n) rather than
+    a full O(n log n) sort.
+    """
+    scores = np.asarray(scores, dtype=float)
+    blood_match = np.asarray(blood_match)
+    matched = np.flatnonzero(blood_match == 1)
+    top = _top_by_score(matched, scores, k)
+    if len(top) < k:
+        others = np.flatnonzero(blood_match != 1)
+        top = np.concatenate([top, _top_by_score(others, scores, k - len(top))])
+    return top
+
+def rank_donors(donors, rows, scores, blood_match, dist, limit=10):
+    """
+    Return the best `limit` candidates as JSON-ready dicts, ordered by (blood_match, score).
+
+    Candidate i is donors row rows[i]; scores, blood_match and dist are per candidate.
+    distance_km is None where either location was unknown (dist holds UNKNOWN_DISTANCE_KM).
+    """
+    winners = top_k_indices(blood_match, scores, limit)
+    picked = donors.iloc[np.asarray(rows)[winners]]
+
+    columns = {
+        name: donor_column(picked, name, "").tolist()
+        for name in ("name", "city", "state", "blood_group", "availability")
+    }
+    donor_ids = donor_column(picked, "donor_id", 0).tolist()
+
+    return [
+        {
+            "donor_id": int(donor_ids[j]),
+            "name": columns["name"][j],
+            "city": columns["city"][j],
+            "state": columns["state"][j],
+            "blood_group": columns["blood_group"][j],
+            "availability": columns["availability"][j],
+            "score": float(scores[i]),
+            "distance_km": float(dist[i]) if dist[i] < UNKNOWN_DISTANCE_KM else None,
+            "blood_match": int(blood_match[i])
+        }
+        for j, i in enumerate(winners)
+    ]
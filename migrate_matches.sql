@@ -0,0 +1,27 @@
+-- migrate_matches.sql
+-- Prepares a database loaded from rakth_sathi.sql (or any database created
+-- before schema.sql had these keys) for the app's match upserts:
+--
+--   mysql -u root -p rakth_sathi < migrate_matches.sql
+--
+-- The app saves matches with INSERT ... ON DUPLICATE KEY UPDATE against the
+-- UNIQUE (request_id, donor_id) key. Without the key every save appends new
+-- rows, and the dump already holds duplicate (request_id, donor_id) pairs,
+-- which must go before the key can be added.
+
+-- 1. Remove duplicates: per (request_id, donor_id) keep the row furthest along
+--    (Completed > Accepted > Rejected > Pending), then the most recent one.
+DELETE m FROM matches m
+JOIN matches keep
+  ON keep.request_id = m.request_id
+ AND keep.donor_id = m.donor_id
+ AND (FIELD(keep.status, 'Pending', 'Rejected', 'Accepted', 'Completed')
+        > FIELD(m.status, 'Pending', 'Rejected', 'Accepted', 'Completed')
+      OR (FIELD(keep.status, 'Pending', 'Rejected', 'Accepted', 'Completed')
+            = FIELD(m.status, 'Pending', 'Rejected', 'Accepted', 'Completed')
+          AND keep.match_id > m.match_id));
+
+-- 2. Add the keys schema.sql declares
+ALTER TABLE matches
+  ADD UNIQUE KEY uq_matches_request_donor (request_id, donor_id),
+  ADD KEY idx_matches_request_match (request_id, match_id);
@@ -0,0 +1,161 @@
+# model_registry.py
+"""
+Versioned, hot-reloadable match scorer.
+
+A background thread polls the model files. When they change (and have stopped
+changing), the new version is loaded and validated on a sample feature batch
+off the request path, then swapped in with a single assignment. Matches that
+already called current() keep the scorer they started with. If a new version
+fails to load or validate, the previous one stays active.
+"""
+import os
+import threading
+import time
+
+from scorer import (
+    COMPILE_TOLERANCE, CompiledScorer, SklearnScorer, compile_models, file_digest, sample_features,
+    validate_scorer,
+)
+
+HEURISTIC_VERSION = "heuristic"
+
+
+class ModelRegistry:
+    """
+    compiled_file    -- models/matcher_compiled.npz from compile_models.py (preferred)
+    tree_file,
+    logreg_file      -- the joblib models from train_models.py
+    poll_interval    -- seconds between file checks; 0 disables the watcher
+
+    current() returns (scorer, version); scorer is None when no model is
+    available and matching falls back to its heuristic.
+    """
+
+    def __init__(self, compiled_file, tree_file, logreg_file, poll_interval=10.0, sample_size=2000):
+        self.compiled_file = compiled_file
+        self.tree_file = tree_file
+        self.logreg_file = logreg_file
+        self.poll_interval = float(poll_interval)
+        self._sample = sample_features(sample_size, seed=1)
+
+        self._active = (None, HEURISTIC_VERSION)
+        self._active_kind = HEURISTIC_VERSION
+        self._loaded_signature = None
+        self._seen_signature = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+
+        # counters for stats()
+        self.loaded_at = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+    def current(self):
+        return self._active
+
+    def on_swap(self, callback):
+        """Call callback(version) after every swap to a new version."""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start the file watcher (no-op if already running or poll_interval is 0)."""
+        if self.poll_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def reload(self):
+        """Load whatever the model files hold now and swap it in. Returns True on success."""
+        with self._reload_lock:
+            signature = self._signature()
+            try:
+                scorer, version, kind = self._load()
+                if scorer is not None:
+                    validate_scorer(scorer, self._sample)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._loaded_signature = signature  # don't retry the same broken files every poll
+                print(f"⚠️ Could not load match models, keeping {self._active[1]}: {e}")
+                return False
+
+            previous = self._active[1]
+            self._active = (scorer, version)
+            self._active_kind = kind
+            self._loaded_signature = signature
+            self.loaded_at = time.time()
+            self.last_error = None
+            if version != previous:
+                self.reloads += 1
+                print(f"✅ Match models: {previous} -> {version}")
+                for callback in self._listeners:
+                    try:
+                        callback(version)
+                    except Exception as e:
+                        print(f"⚠️ Model swap listener failed: {e}")
+            return True
+
+    def stats(self):
+        return {
+            "version": self._active[1],
+            "kind": self._active_kind,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "watching": self._thread is not None,
+        }
+
+    def _signature(self):
+        sig = []
+        for path in (self.compiled_file, self.tree_file, self.logreg_file):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _load(self):
+        """Returns (scorer, version, kind) for the current files."""
+        has_joblib = os.path.exists(self.tree_file) and os.path.exists(self.logreg_file)
+        source = file_digest(self.tree_file, self.logreg_file) if has_joblib else None
+
+        if os.path.exists(self.compiled_file):
+            compiled = CompiledScorer.load(self.compiled_file)
+            # stale when the joblib models were retrained after compile_models.py last ran
+            if source is None or not compiled.source or compiled.source == source:
+                return compiled, f"compiled-{file_digest(self.compiled_file)}", "compiled"
+        if not has_joblib:
+            return None, HEURISTIC_VERSION, HEURISTIC_VERSION
+
+        # retrained but not recompiled: compile in memory when it reproduces sklearn exactly
+        from joblib import load  # only imported on this path, so serving compiled models never loads sklearn
+        tree, logreg = load(self.tree_file), load(self.logreg_file)
+        sk = SklearnScorer(tree, logreg)
+        version = f"joblib-{source}"
+        try:
+            compiled = compile_models(tree, logreg, source)
+            if abs(compiled.score(self._sample) - sk.score(self._sample)).max() <= COMPILE_TOLERANCE:
+                print(f"⚠️ {self.compiled_file} is missing or older than the joblib models; "
+                      f"compiled them in memory (run compile_models.py)")
+                return compiled, version, "compiled"
+        except Exception as e:
+            print(f"⚠️ Could not compile the joblib models, scoring with sklearn: {e}")
+        return sk, version, "sklearn"
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                signature = self._signature()
+                if signature == self._loaded_signature:
+                    continue
+                # wait one more poll for the files to settle (a retrain writes two of them)
+                if signature != self._seen_signature:
+                    self._seen_signature = signature
+                    continue
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ Model watcher error: {e}")
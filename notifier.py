@@ -0,0 +1,322 @@
+# notifier.py
+"""
+Donor emails over pooled SMTP sessions.
+
+send_email.send_email() connects, runs STARTTLS, logs in and quits for every
+message, so emailing ten matched donors costs ten handshakes in a row.
+SMTPPool keeps up to `size` authenticated sessions open between messages, and
+Notifier.send_many() sends a batch of messages through them concurrently,
+reporting success or the SMTP error for each recipient. match_messages()
+turns a /match/<id> result into one message per top donor.
+
+smtp_stub.py is a local SMTP stand-in for trying this without a provider
+(see bench_notify.py).
+"""
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from send_email import build_message
+
+
+class SMTPPoolTimeout(Exception):
+    """No SMTP session became free within the pool's timeout."""
+
+
+class SMTPPool:
+    """
+    host, port      -- SMTP server
+    user, password  -- login (skipped when either is empty, e.g. for a local stand-in)
+    size            -- most sessions open at once; more senders wait for a free one
+    starttls        -- upgrade each new session with STARTTLS before logging in
+    timeout         -- socket timeout, and seconds to wait for a free session
+    max_idle        -- a session idle longer than this is checked with NOOP before reuse
+    max_messages    -- messages per session before it is replaced (providers cap this)
+    """
+
+    def __init__(self, host, port, user=None, password=None, size=4, starttls=True, timeout=10.0,
+                 max_idle=60.0, max_messages=100):
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.size = int(size)
+        self.starttls = starttls
+        self.timeout = float(timeout)
+        self.max_idle = float(max_idle)
+        self.max_messages = int(max_messages)
+
+        self._idle = deque()  # (smtp, last_used, messages_sent), most recently returned last
+        self._open = 0
+        self._cond = threading.Condition()
+
+        # counters for stats()
+        self.checkouts = 0
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+        self.timeouts = 0
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """
+        smtplib's sendmail() over a pooled session. If the server has dropped
+        the session (idle timeout), the message is retried once on a new one.
+        """
+        try:
+            return self._sendmail(from_addr, to_addrs, msg, fresh=False)
+        except smtplib.SMTPServerDisconnected:
+            with self._cond:
+                self.reconnects += 1
+            return self._sendmail(from_addr, to_addrs, msg, fresh=True)
+
+    def close(self):
+        """Log out of every idle session (sessions in use close when returned)."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for smtp, _, _ in idle:
+            self._close_quietly(smtp)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "host": f"{self.host}:{self.port}",
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "opened": self.opened,
+                "reused": self.reused,
+                "reconnects": self.reconnects,
+                "timeouts": self.timeouts,
+            }
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _sendmail(self, from_addr, to_addrs, msg, fresh):
+        smtp, sent = self._checkout(fresh)
+        healthy = False
+        try:
+            result = smtp.sendmail(from_addr, to_addrs, msg)
+            healthy = True
+            return result
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            healthy = True  # the server refused this message; smtplib reset the session for the next one
+            raise
+        finally:
+            self._release(smtp, sent + 1, healthy)
+
+    def _checkout(self, fresh):
+        deadline = time.monotonic() + self.timeout
+        entry = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1  # reserve the slot; connect outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise SMTPPoolTimeout(f"no SMTP session free after {self.timeout:.1f}s")
+                self._cond.wait(remaining)
+            self.checkouts += 1
+
+        try:
+            if entry is not None:
+                smtp, last_used, sent = entry
+                if not fresh and sent < self.max_messages and self._alive(smtp, last_used):
+                    with self._cond:
+                        self.reused += 1
+                    return smtp, sent
+                self._close_quietly(smtp)
+            return self._connect(), 0
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _alive(self, smtp, last_used):
+        if time.monotonic() - last_used <= self.max_idle:
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+        except Exception:
+            self._close_quietly(smtp)
+            raise
+        with self._cond:
+            self.opened += 1
+        return smtp
+
+    def _release(self, smtp, sent, healthy):
+        with self._cond:
+            if healthy:
+                self._idle.append((smtp, time.monotonic(), sent))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not healthy:
+            self._close_quietly(smtp)
+
+    @staticmethod
+    def _close_quietly(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+
+class Notifier:
+    """
+    pool     -- SMTPPool the messages go through
+    sender   -- From address (SENDER_EMAIL)
+    workers  -- messages in flight at once; defaults to the pool size
+    """
+
+    def __init__(self, pool, sender, workers=None):
+        self.pool = pool
+        self.sender = sender
+        self.workers = int(workers or pool.size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # counters for stats()
+        self.batches = 0
+        self.sent = 0
+        self.failed = 0
+        self.send_seconds = 0.0
+
+    def send(self, to_email, recipient_name, subject, body, urgency="Normal"):
+        """Send one email (see send_email.build_message). Raises on failure."""
+        if not self.sender:
+            raise RuntimeError("❌ Missing SENDER_EMAIL in environment or .env")
+        msg = build_message(to_email, recipient_name, subject, body, urgency, sender=self.sender)
+        self.pool.sendmail(self.sender, [to_email], msg.as_string())
+
+    def send_many(self, messages):
+        """
+        Send every message concurrently. Each message is a dict with to_email,
+        recipient_name, subject, body, optionally urgency and donor_id.
+        Returns one result per message, in order:
+            {"donor_id", "to_email", "recipient_name", "ok": True}
+            {"donor_id", "to_email", "recipient_name", "ok": False, "error": "550 ..."}
+        A refused recipient or a failed connection only fails its own message.
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        started = time.monotonic()
+        futures = [self._pool_executor().submit(self._send_one, m) for m in messages]
+        results = [f.result() for f in futures]
+        ok = sum(1 for r in results if r["ok"])
+        with self._lock:
+            self.batches += 1
+            self.sent += ok
+            self.failed += len(results) - ok
+            self.send_seconds += time.monotonic() - started
+        if ok < len(results):
+            print(f"⚠️ Sent {ok}/{len(results)} emails; failed: "
+                  + ", ".join(r["to_email"] for r in results if not r["ok"]))
+        return results
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.pool.close()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "workers": self.workers,
+                "batches": self.batches,
+                "sent": self.sent,
+                "failed": self.failed,
+                "avg_batch_ms": round(1000 * self.send_seconds / self.batches, 3) if self.batches else 0.0,
+            }
+        stats["smtp_pool"] = self.pool.stats()
+        return stats
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _pool_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+            return self._executor
+
+    def _send_one(self, message):
+        result = {key: message[key] for key in ("donor_id", "to_email", "recipient_name") if key in message}
+        try:
+            self.send(message["to_email"], message.get("recipient_name", ""), message["subject"],
+                      message["body"], message.get("urgency", "Normal"))
+            result["ok"] = True
+        except smtplib.SMTPRecipientsRefused as e:
+            code, text = next(iter(e.recipients.values()))
+            result.update(ok=False, error=f"{code} {text.decode('utf-8', 'replace') if isinstance(text, bytes) else text}")
+        except Exception as e:
+            result.update(ok=False, error=f"{type(e).__name__}: {e}")
+        return result
+
+
+# -----------------------
+# Messages for a match
+# -----------------------
+# requests.urgency -> the send_email urgency levels
+EMAIL_URGENCY = {"Critical": "High", "High": "High", "Medium": "Normal", "Low": "Low"}
+
+
+def match_messages(match, contacts, subject=None, body=None):
+    """
+    One send_many() message per donor of a /match/<id> result (match["top_donors"]).
+    contacts maps donor_id -> {"name", "email"}; donors without an email are left out.
+    The patient's contact details are not included (they go to donors who accept).
+    """
+    blood_group = match.get("blood_group_needed") or ""
+    city = match.get("city") or ""
+    urgency = EMAIL_URGENCY.get(match.get("urgency") or "", "Normal")
+    if subject is None:
+        subject = f"{'Urgent ' if urgency == 'High' else ''}Blood Donation Request: {blood_group} needed"
+    if body is None:
+        where = f" in {city}" if city else ""
+        body = f"""
+A patient{where} needs {blood_group} blood, and you are one of the closest compatible donors.
+
+Please come forward if you can donate blood.
+"""
+    messages = []
+    for donor in match.get("top_donors") or []:
+        donor_id = int(donor["donor_id"])
+        contact = contacts.get(donor_id) or {}
+        if not contact.get("email"):
+            continue
+        messages.append({
+            "donor_id": donor_id,
+            "to_email": contact["email"],
+            "recipient_name": contact.get("name") or donor.get("name") or "Donor",
+            "subject": subject,
+            "body": body,
+            "urgency": urgency,
+        })
+    return messages
@@ -0,0 +1,126 @@
+# reply_cache.py
+"""
+Cache of chatbot replies generated by the language model.
+
+Most chat traffic repeats a few questions, and each LLM answer takes seconds.
+Replies are keyed by the normalized question plus the conversation turns that
+went into the prompt, so a question asked with no history shares one entry
+however it is capitalised or punctuated. Entries expire after `ttl` and the
+least recently used are evicted beyond `maxsize` (ttl_cache.TTLCache).
+
+With a `path`, the cache is written there (atomically, every `save_every` new
+replies and on save()) and read back at startup. The saved file records a
+namespace -- a digest of the model, system prompt and generation settings --
+and is ignored once any of those change.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+from ttl_cache import TTLCache
+
+CACHE_FORMAT = 1
+
+_NON_WORD = re.compile(r"[^a-z0-9+\- ]+")  # keep + and - for blood groups
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    """Lower-case, punctuation-free, single-spaced form of a question."""
+    text = _NON_WORD.sub(" ", str(text).lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def reply_key(question, history=()):
+    """Cache key for `question` asked after the (user, bot) turns in `history`."""
+    key = normalize_question(question)
+    if not history:
+        return key
+    h = hashlib.sha1()
+    for user, bot in history:
+        h.update(normalize_question(user).encode("utf-8") + b"\0" + bot.encode("utf-8") + b"\0")
+    return f"{key}#{h.hexdigest()[:12]}"
+
+
+def namespace_of(*parts):
+    """Digest identifying what produced the cached replies (model, prompt, settings)."""
+    return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+
+
+class ReplyCache:
+    """
+    maxsize     -- replies kept (0 disables the cache)
+    ttl         -- seconds a reply stays valid; None keeps it until evicted
+    path        -- JSON file to persist to; None keeps the cache in memory only
+    namespace   -- namespace_of(...) for the current model setup
+    save_every  -- new replies between automatic saves
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, path=None, namespace="", save_every=20):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.path = path
+        self.namespace = namespace
+        self.save_every = int(save_every)
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+
+        # counters for stats()
+        self.loaded = 0
+        self.saves = 0
+        self.save_errors = 0
+
+    def get(self, question, history=()):
+        return self._cache.get(reply_key(question, history))
+
+    def set(self, question, reply, history=()):
+        if self._cache.maxsize <= 0:
+            return
+        self._cache.set(reply_key(question, history), reply)
+        if self.path:
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self.save()
+
+    def load(self):
+        """Read the saved cache, if there is one for this namespace. Returns entries loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != CACHE_FORMAT or data.get("namespace") != self.namespace:
+                print(f"⚠️ Ignoring {self.path}: written for a different chatbot model or prompt")
+                return 0
+            for key, stored_at, reply in data.get("entries", []):
+                self._cache.set(key, reply, stored_at=stored_at)
+        except Exception as e:
+            print(f"⚠️ Could not read chatbot reply cache {self.path}: {e}")
+            return 0
+        self.loaded = len(self._cache)
+        return self.loaded
+
+    def save(self):
+        """Write every live entry to `path` atomically."""
+        if not self.path:
+            return
+        with self._save_lock:
+            self._unsaved = 0
+            data = {"format": CACHE_FORMAT, "namespace": self.namespace,
+                    "entries": [list(entry) for entry in self._cache.items()]}
+            tmp_path = f"{self.path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self.saves += 1
+            except Exception as e:
+                self.save_errors += 1
+                print(f"⚠️ Could not save chatbot reply cache {self.path}: {e}")
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats.update(path=self.path, loaded=self.loaded, saves=self.saves, save_errors=self.save_errors)
+        return stats
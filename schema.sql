@@ -26,9 +26,23 @@ CREATE TABLE IF NOT EXISTS donors (
   number_of_donation INT DEFAULT NULL,
   pints_donated INT DEFAULT NULL,
   created_at DATE DEFAULT NULL,
-  UNIQUE KEY (email)
+  -- watermark for the app's incremental donor snapshot refresh
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY (email),
+  KEY idx_donors_updated_at (updated_at),
+  -- match pushdown: WHERE blood_group IN (...) AND (<normalized city> IN (...) OR <normalized state> IN (...));
+  -- the blood_group prefix does the seeking, city/state are read from the index
+  KEY idx_donors_bg_city (blood_group, city),
+  KEY idx_donors_bg_state (blood_group, state)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- For an existing database:
+-- ALTER TABLE donors
+--   ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+--   ADD KEY idx_donors_updated_at (updated_at),
+--   ADD KEY idx_donors_bg_city (blood_group, city),
+--   ADD KEY idx_donors_bg_state (blood_group, state);
+
 -- requests
 CREATE TABLE IF NOT EXISTS requests (
   request_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -48,5 +62,23 @@ CREATE TABLE IF NOT EXISTS matches (
   donor_id INT DEFAULT NULL,
   match_score FLOAT DEFAULT NULL,
   status ENUM('Pending','Accepted','Rejected','Completed') DEFAULT 'Pending',
-  created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+  -- one row per (request, donor); the app upserts match results against this key
+  UNIQUE KEY uq_matches_request_donor (request_id, donor_id),
+  -- keyset pagination of a request's matches (/matches/request/<id>?after_match_id=)
+  KEY idx_matches_request_match (request_id, match_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- For an existing database (e.g. loaded from rakth_sathi.sql) run migrate_matches.sql, which
+-- removes duplicate (request_id, donor_id) rows first and then adds:
+-- ALTER TABLE matches ADD UNIQUE KEY uq_matches_request_donor (request_id, donor_id);
+-- ALTER TABLE matches ADD KEY idx_matches_request_match (request_id, match_id);
+
+-- donors emailed about a request (POST /match/<id>/notify skips them on a repeat);
+-- for an existing database, run this statement on its own
+CREATE TABLE IF NOT EXISTS notifications (
+  request_id INT NOT NULL,
+  donor_id INT NOT NULL,
+  notified_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (request_id, donor_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,149 @@
+# scorer.py
+"""
+Match scorers: the sklearn tree + logreg pair, or the same ensemble compiled
+to plain NumPy arrays (compile_models.py) so serving never imports sklearn.
+
+Both expose score(X) -> 1-D array, the average of the tree's and logreg's
+probability of a good match for each row of the FEATURE_COLUMNS matrix.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+COMPILED_FORMAT = 1
+# max |compiled - sklearn| accepted when compiling
+COMPILE_TOLERANCE = 1e-9
+
+
+def file_digest(*paths):
+    """Short content hash of one or more files."""
+    h = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def sample_features(n=20000, seed=0):
+    """Random FEATURE_COLUMNS rows spanning (and exceeding) the ranges seen in matching."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 2, n),          # blood_match
+        rng.uniform(0, 2500, n),        # dist
+        rng.integers(1, 5, n),          # urg_score
+        rng.integers(0, 3600, n),       # days_since
+        rng.integers(0, 2, n),          # availability
+        rng.integers(0, 40, n),         # number_of_donation
+        rng.integers(0, 40, n),         # pints_donated
+    ]).astype(float)
+
+
+def validate_scorer(scorer, X):
+    """Raise ValueError unless scorer.score(X) is one finite probability per row."""
+    scores = np.asarray(scorer.score(X), dtype=float)
+    if scores.shape != (len(X),):
+        raise ValueError(f"scorer returned shape {scores.shape} for {len(X)} rows")
+    if not np.all(np.isfinite(scores)) or scores.min() < 0.0 or scores.max() > 1.0:
+        raise ValueError("scorer returned values outside [0, 1]")
+    return scores
+
+
+class SklearnScorer:
+    """The fitted sklearn models, called as-is."""
+
+    def __init__(self, tree, logreg):
+        self.tree = tree
+        self.logreg = logreg
+
+    def score(self, X):
+        try:
+            probs_tree = self.tree.predict_proba(X)[:, 1]
+        except Exception:
+            probs_tree = self.tree.predict(X)
+        try:
+            probs_log = self.logreg.predict_proba(X)[:, 1]
+        except Exception:
+            probs_log = self.logreg.predict(X)
+        return (np.array(probs_tree) + np.array(probs_log)) / 2.0
+
+
+class CompiledScorer:
+    """
+    Tree and logreg flattened into arrays.
+
+    The tree is walked for all rows at once, one level per step; leaves point
+    at themselves, so after max_depth steps every row sits on its leaf.
+    """
+
+    def __init__(self, left, right, feature, threshold, leaf_value, max_depth, coef, intercept, source=""):
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        # file_digest() of the joblib models this was compiled from
+        self.source = str(source)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data["format"]) != COMPILED_FORMAT:
+                raise ValueError(f"{path}: unsupported compiled scorer format {int(data['format'])}")
+            return cls(data["left"], data["right"], data["feature"], data["threshold"],
+                       data["leaf_value"], data["max_depth"], data["coef"], data["intercept"],
+                       str(data["source"]) if "source" in data else "")
+
+    def save(self, path):
+        """Write to `path` atomically, so a process watching it never reads half a file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, format=COMPILED_FORMAT, left=self.left, right=self.right, feature=self.feature,
+                     threshold=self.threshold, leaf_value=self.leaf_value, max_depth=self.max_depth,
+                     coef=self.coef, intercept=self.intercept, source=self.source)
+        os.replace(tmp_path, path)
+
+    def tree_proba(self, X):
+        # sklearn compares float32 features against the thresholds; do the same
+        X32 = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X32))
+        node = np.zeros(len(X32), dtype=np.int64)
+        for _ in range(self.max_depth):
+            go_left = X32[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.leaf_value[node]
+
+    def logreg_proba(self, X):
+        logit = np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+        return 1.0 / (1.0 + np.exp(-logit))
+
+    def score(self, X):
+        return (self.tree_proba(X) + self.logreg_proba(X)) / 2.0
+
+
+def compile_models(tree, logreg, source=""):
+    """CompiledScorer equivalent to SklearnScorer(tree, logreg) for a binary tree + logreg."""
+    if len(logreg.classes_) != 2 or logreg.coef_.shape[0] != 1:
+        raise ValueError("only binary logistic regression can be compiled")
+
+    t = tree.tree_
+    node_ids = np.arange(t.node_count)
+    is_leaf = t.children_left < 0
+    left = np.where(is_leaf, node_ids, t.children_left)
+    right = np.where(is_leaf, node_ids, t.children_right)
+    # leaves never read their feature/threshold; keep them valid indexes
+    feature = np.where(is_leaf, 0, t.feature)
+    threshold = np.where(is_leaf, 0.0, t.threshold)
+
+    value = t.value[:, 0, :]
+    if len(tree.classes_) == 2:
+        leaf_value = value[:, 1] / value.sum(axis=1)
+    else:
+        # single-class tree: predict_proba has no column 1, SklearnScorer falls back to predict()
+        leaf_value = np.full(t.node_count, float(tree.classes_[0]))
+
+    return CompiledScorer(left, right, feature, threshold, leaf_value, t.max_depth,
+                          logreg.coef_[0], logreg.intercept_[0], source)
@@ -10,18 +10,20 @@ load_dotenv()
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_APP_PASSWORD = os.getenv("SENDER_APP_PASSWORD")
 
-def send_email(to_email: str, recipient_name: str, subject: str, body: str, urgency: str = "Normal"):
+# SMTP server (Gmail by default; point at a local stand-in such as smtp_stub.py for tests)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+
+def build_message(to_email: str, recipient_name: str, subject: str, body: str, urgency: str = "Normal",
+                  sender: str = None):
     """
-    Send an email with recipient details and urgency.
-    
+    The email send_email() sends, as a MIMEMultipart (also used by notifier.py).
+
     urgency can be: "High", "Normal", "Low"
     """
-    if not SENDER_EMAIL or not SENDER_APP_PASSWORD:
-        raise RuntimeError("❌ Missing SENDER_EMAIL or SENDER_APP_PASSWORD in environment or .env")
-
-    # Build email
     msg = MIMEMultipart()
-    msg["From"] = SENDER_EMAIL
+    msg["From"] = sender or SENDER_EMAIL
     msg["To"] = to_email
     msg["Subject"] = subject
 
@@ -42,11 +44,25 @@ Hi {recipient_name},
 ⚡ Urgency: {urgency}
 """
     msg.attach(MIMEText(personalized_body, "plain"))
+    return msg
+
+def send_email(to_email: str, recipient_name: str, subject: str, body: str, urgency: str = "Normal"):
+    """
+    Send an email with recipient details and urgency, over a new SMTP connection.
+    To reach several recipients use notifier.py, which reuses connections.
+
+    urgency can be: "High", "Normal", "Low"
+    """
+    if not SENDER_EMAIL or not SENDER_APP_PASSWORD:
+        raise RuntimeError("❌ Missing SENDER_EMAIL or SENDER_APP_PASSWORD in environment or .env")
+
+    msg = build_message(to_email, recipient_name, subject, body, urgency)
 
-    # Send email via Gmail SMTP
+    # Send email via SMTP (Gmail by default)
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        if SMTP_STARTTLS:
+            server.starttls()
         server.login(SENDER_EMAIL, SENDER_APP_PASSWORD)
         server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
         server.quit()
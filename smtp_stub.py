@@ -0,0 +1,155 @@
+# smtp_stub.py
+"""
+Local SMTP stand-in for testing notifier.py and send_email.py without a mail
+provider (bench_notify.py, or run it on its own):
+
+    python smtp_stub.py --port 1025 --delay-ms 50
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 SENDER_EMAIL=app@example.com python app.py
+
+It speaks enough SMTP for smtplib (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT), accepts any login, and keeps the messages it receives.
+Every reply is delayed by `delay_ms` to stand in for the network round trips
+of a real provider. Recipients in `reject` are refused with 550. STARTTLS is
+not offered, so clients need SMTP_STARTTLS=0.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPStub:
+    """
+    host, port  -- where to listen (port 0 picks a free one; see .port after start())
+    delay_ms    -- added before every reply
+    reject      -- recipient addresses refused at RCPT TO
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay_ms=0.0, reject=()):
+        self.host = host
+        self.port = int(port)
+        self.delay = float(delay_ms) / 1000
+        self.reject = {a.lower() for a in reject}
+        self.messages = []  # (mail_from, [rcpt_to], data)
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stub._session(self.rfile, self.wfile)
+
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="smtp-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        with self._lock:
+            return {"connections": self.connections, "logins": self.logins, "messages": len(self.messages)}
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _session(self, rfile, wfile):
+        def reply(line):
+            if self.delay:
+                time.sleep(self.delay)
+            wfile.write((line + "\r\n").encode("utf-8"))
+            wfile.flush()
+
+        with self._lock:
+            self.connections += 1
+        reply("220 smtp-stub ready")
+        mail_from, rcpt_to = None, []
+        while True:
+            raw = rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+            arg = line[len(verb):].strip()
+
+            if verb in ("EHLO", "HELO"):
+                reply("250-smtp-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME" if verb == "EHLO" else "250 smtp-stub")
+            elif verb == "AUTH":
+                if arg.upper().startswith("LOGIN"):
+                    if len(arg.split()) < 2:
+                        reply("334 VXNlcm5hbWU6")
+                        rfile.readline()
+                    reply("334 UGFzc3dvcmQ6")
+                    rfile.readline()
+                with self._lock:
+                    self.logins += 1
+                reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = _address(arg), []
+                reply("250 OK")
+            elif verb == "RCPT":
+                address = _address(arg)
+                if address.lower() in self.reject:
+                    reply(f"550 5.1.1 <{address}>: mailbox unavailable")
+                else:
+                    rcpt_to.append(address)
+                    reply("250 OK")
+            elif verb == "DATA":
+                if not rcpt_to:
+                    reply("503 5.5.1 No valid recipients")
+                    continue
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                with self._lock:
+                    self.messages.append((mail_from, rcpt_to, b"".join(lines).decode("utf-8", "replace")))
+                mail_from, rcpt_to = None, []
+                reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, rcpt_to = None, []
+                reply("250 OK")
+            elif verb == "NOOP":
+                reply("250 OK")
+            elif verb == "QUIT":
+                reply("221 Bye")
+                return
+            else:
+                reply("502 5.5.2 Command not implemented")
+
+
+def _address(arg):
+    """The address in 'FROM:<a@b> SIZE=..' / 'TO:<a@b>'."""
+    start, end = arg.find("<"), arg.find(">")
+    if start != -1 and end > start:
+        return arg[start + 1:end]
+    return arg.partition(":")[2].strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--reject", action="append", default=[], help="recipient to refuse (repeatable)")
+    args = parser.parse_args()
+    stub = SMTPStub(args.host, args.port, args.delay_ms, args.reject).start()
+    print(f"✅ SMTP stand-in listening on {args.host}:{stub.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(stub.stats())
+    except KeyboardInterrupt:
+        stub.stop()